@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenAI Batch API封装
+将全部文本块写入JSONL文件一次性提交，按批处理价格计费（约为实时请求的一半），
+并使用独立的批处理速率限制，适合不要求即时返回的非交互任务
+"""
+
+import io
+import json
+import time
+import logging
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 批处理任务的终止状态
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_jsonl(requests: List[Dict[str, Any]]) -> bytes:
+    """
+    构建批处理输入文件内容
+
+    Args:
+        requests: [{"custom_id": ..., "body": API调用参数}, ...]
+
+    Returns:
+        bytes: JSONL格式的UTF-8内容
+    """
+    lines = [
+        json.dumps({
+            "custom_id": request["custom_id"],
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": request["body"]
+        }, ensure_ascii=False)
+        for request in requests
+    ]
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def submit_batch(client, requests: List[Dict[str, Any]],
+                 completion_window: str = "24h",
+                 metadata: Optional[Dict[str, str]] = None) -> str:
+    """
+    上传输入文件并创建批处理任务
+
+    Args:
+        client: OpenAI客户端
+        requests: [{"custom_id": ..., "body": API调用参数}, ...]
+        completion_window: 完成时间窗口
+        metadata: 批处理任务元数据
+
+    Returns:
+        str: 批处理任务ID
+    """
+    content = build_batch_jsonl(requests)
+    input_file = client.files.create(
+        file=("batch_input.jsonl", io.BytesIO(content)),
+        purpose="batch"
+    )
+    logger.info("批处理输入文件已上传: %s (%d 个请求)", input_file.id, len(requests))
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window=completion_window,
+        metadata=metadata
+    )
+    logger.info("批处理任务已提交: %s", batch.id)
+    return batch.id
+
+
+def wait_for_batch(client, batch_id: str, check_interval: int = 30,
+                   max_wait_time: Optional[int] = None):
+    """
+    轮询批处理任务直到结束
+
+    Args:
+        client: OpenAI客户端
+        batch_id: 批处理任务ID
+        check_interval: 状态检查间隔（秒）
+        max_wait_time: 最大等待时间（秒），None表示一直等待
+
+    Returns:
+        处于终止状态的批处理任务对象
+    """
+    start_time = time.time()
+
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in BATCH_FINAL_STATUSES:
+            logger.info("批处理任务 %s 结束，状态: %s", batch_id, batch.status)
+            return batch
+
+        elapsed = int(time.time() - start_time)
+        if max_wait_time is not None and elapsed > max_wait_time:
+            raise TimeoutError(f"批处理任务 {batch_id} 等待超时（{max_wait_time}秒）")
+
+        counts = batch.request_counts
+        if counts:
+            logger.info("批处理任务 %s 状态: %s，已完成 %d/%d (已等待 %d秒)",
+                        batch_id, batch.status, counts.completed, counts.total, elapsed)
+        else:
+            logger.info("批处理任务 %s 状态: %s (已等待 %d秒)", batch_id, batch.status, elapsed)
+        time.sleep(check_interval)
+
+
+def download_batch_output(client, batch) -> Dict[str, Dict[str, Any]]:
+    """
+    下载批处理输出文件和错误文件
+
+    Args:
+        client: OpenAI客户端
+        batch: 处于终止状态的批处理任务对象
+
+    Returns:
+        Dict[str, Dict[str, Any]]: {custom_id: 输出行}，输出行包含response和error字段
+    """
+    outputs = {}
+
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = client.files.content(file_id).text
+        for line in content.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                outputs[record["custom_id"]] = record
+
+    logger.info("批处理输出已下载: %d 条记录", len(outputs))
+    return outputs
+
+
+def parse_batch_record(record: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    解析单条批处理输出记录
+
+    Args:
+        record: 输出行，缺失时为None
+
+    Returns:
+        Dict[str, Any]: 成功时为Chat Completions响应体，失败时包含error字段
+    """
+    if record is None:
+        return {"error": "批处理输出中缺少该请求的结果"}
+
+    if record.get("error"):
+        error = record["error"]
+        return {"error": error.get("message", str(error)) if isinstance(error, dict) else str(error)}
+
+    response = record.get("response") or {}
+    if response.get("status_code") != 200:
+        body = response.get("body") or {}
+        error = body.get("error") or {}
+        message = error.get("message") if isinstance(error, dict) else error
+        return {"error": f"HTTP {response.get('status_code')}: {message or '未知错误'}"}
+
+    return response.get("body") or {"error": "批处理响应体为空"}
@@ -15,9 +15,33 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 
+# 可选：orjson提供更快的JSON读写
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
+
+def _read_json(path: Path) -> Any:
+    """读取JSON文件（orjson可用时直接解析字节）"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path: Path, data: Any):
+    """以缩进格式写入JSON文件（orjson可用时直接写入UTF-8字节）"""
+    if ORJSON_AVAILABLE:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
 # =============================================================================
 # 数据结构定义
 # =============================================================================
@@ -49,6 +73,7 @@ class BatchProcessingCheckpoint:
     current_file_index: int
     output_directory: str
     is_completed: bool = False
+    input_fingerprint: Optional[str] = None  # 输入文件集合的指纹，用于判断输入是否变化
 
 
 # =============================================================================
@@ -80,7 +105,9 @@ class CheckpointManager:
                          files: List[str],
                          processing_config: Dict[str, Any],
                          output_directory: str,
-                         session_id: Optional[str] = None) -> str:
+                         session_id: Optional[str] = None,
+                         input_fingerprint: Optional[str] = None,
+                         file_hashes: Optional[List[str]] = None) -> str:
         """
         创建新的断点
         
@@ -89,6 +116,8 @@ class CheckpointManager:
             processing_config: 处理配置
             output_directory: 输出目录
             session_id: 会话ID
+            input_fingerprint: 输入文件集合的指纹（见compute_input_fingerprint）
+            file_hashes: 与files一一对应的内容哈希（用于不对应磁盘文件的虚拟文本），None表示按文件内容计算
             
         Returns:
             str: 断点ID
@@ -101,10 +130,10 @@ class CheckpointManager:
         
         # 创建文件状态列表
         files_state = []
-        for file_path in files:
+        for i, file_path in enumerate(files):
             try:
                 file_size = os.path.getsize(file_path)
-                file_hash = self._calculate_file_hash(file_path)
+                file_hash = file_hashes[i] if file_hashes else self._calculate_file_hash(file_path)
                 
                 state = FileProcessingState(
                     file_path=file_path,
@@ -115,11 +144,11 @@ class CheckpointManager:
                 files_state.append(state)
                 
             except Exception as e:
-                logger.warning(f"无法获取文件信息 {file_path}: {e}")
+                logger.warning("无法获取文件信息 %s: %s", file_path, e)
                 state = FileProcessingState(
                     file_path=file_path,
                     file_size=0,
-                    file_hash="",
+                    file_hash=file_hashes[i] if file_hashes else "",
                     status='failed',
                     error_message=str(e)
                 )
@@ -137,13 +166,14 @@ class CheckpointManager:
             processing_config=processing_config,
             files_state=files_state,
             current_file_index=0,
-            output_directory=output_directory
+            output_directory=output_directory,
+            input_fingerprint=input_fingerprint
         )
         
         self.current_checkpoint = checkpoint
         self._save_checkpoint()
         
-        logger.info(f"创建断点: {checkpoint_id}, 文件数: {len(files)}")
+        logger.info("创建断点: %s, 文件数: %d", checkpoint_id, len(files))
         return checkpoint_id
     
     def save_checkpoint(self):
@@ -164,13 +194,12 @@ class CheckpointManager:
             checkpoint_data = asdict(self.current_checkpoint)
             
             # 保存到文件
-            with open(checkpoint_file, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint_data, f, indent=2, ensure_ascii=False)
+            _write_json(checkpoint_file, checkpoint_data)
                 
-            logger.debug(f"断点已保存: {checkpoint_file}")
+            logger.debug("断点已保存: %s", checkpoint_file)
             
         except Exception as e:
-            logger.error(f"保存断点失败: {e}")
+            logger.error("保存断点失败: %s", e)
     
     # =============================================================================
     # 断点加载和恢复
@@ -180,10 +209,15 @@ class CheckpointManager:
         """列出所有可用的断点"""
         checkpoints = []
         
-        for checkpoint_file in self.checkpoint_dir.glob("*.json"):
+        with os.scandir(self.checkpoint_dir) as entries:
+            checkpoint_files = [
+                Path(entry.path) for entry in entries
+                if entry.name.endswith(".json") and entry.is_file()
+            ]
+        
+        for checkpoint_file in checkpoint_files:
             try:
-                with open(checkpoint_file, 'r', encoding='utf-8') as f:
-                    checkpoint_data = json.load(f)
+                checkpoint_data = _read_json(checkpoint_file)
                 
                 # 提取关键信息
                 info = {
@@ -194,13 +228,14 @@ class CheckpointManager:
                     "completed_files": checkpoint_data["completed_files"],
                     "failed_files": checkpoint_data["failed_files"],
                     "is_completed": checkpoint_data.get("is_completed", False),
+                    "input_fingerprint": checkpoint_data.get("input_fingerprint"),
                     "progress": f"{checkpoint_data['completed_files']}/{checkpoint_data['total_files']}"
                 }
                 
                 checkpoints.append(info)
                 
             except Exception as e:
-                logger.warning(f"读取断点文件失败 {checkpoint_file}: {e}")
+                logger.warning("读取断点文件失败 %s: %s", checkpoint_file, e)
         
         # 按更新时间排序
         checkpoints.sort(key=lambda x: x["update_time"], reverse=True)
@@ -219,12 +254,11 @@ class CheckpointManager:
         checkpoint_file = self.checkpoint_dir / f"{checkpoint_id}.json"
         
         if not checkpoint_file.exists():
-            logger.error(f"断点文件不存在: {checkpoint_file}")
+            logger.error("断点文件不存在: %s", checkpoint_file)
             return False
         
         try:
-            with open(checkpoint_file, 'r', encoding='utf-8') as f:
-                checkpoint_data = json.load(f)
+            checkpoint_data = _read_json(checkpoint_file)
             
             # 重建文件状态对象
             files_state = []
@@ -236,11 +270,11 @@ class CheckpointManager:
             checkpoint_data["files_state"] = files_state
             self.current_checkpoint = BatchProcessingCheckpoint(**checkpoint_data)
             
-            logger.info(f"断点加载成功: {checkpoint_id}")
+            logger.info("断点加载成功: %s", checkpoint_id)
             return True
             
         except Exception as e:
-            logger.error(f"加载断点失败 {checkpoint_id}: {e}")
+            logger.error("加载断点失败 %s: %s", checkpoint_id, e)
             return False
     
     # =============================================================================
@@ -306,7 +340,54 @@ class CheckpointManager:
                 return state.file_path
         
         return None
-    
+
+    def matches_checkpoint(self, files: List[str], processing_config: Optional[Dict[str, Any]] = None,
+                           file_hashes: Optional[List[str]] = None) -> bool:
+        """
+        检查当前断点是否对应给定的文件列表和处理配置
+
+        Args:
+            files: 文件列表（顺序需一致）
+            processing_config: 处理配置，None表示不比较配置
+            file_hashes: 与files一一对应的内容哈希，None表示不比较内容
+
+        Returns:
+            bool: 是否匹配
+        """
+        if not self.current_checkpoint:
+            return False
+
+        if [state.file_path for state in self.current_checkpoint.files_state] != list(files):
+            return False
+
+        if processing_config is not None and self.current_checkpoint.processing_config != processing_config:
+            return False
+
+        if file_hashes is not None and [state.file_hash for state in self.current_checkpoint.files_state] != list(file_hashes):
+            return False
+
+        return True
+
+    def get_completed_indices(self) -> set:
+        """获取已完成文件在断点文件列表中的索引"""
+        if not self.current_checkpoint:
+            return set()
+
+        return {
+            i for i, state in enumerate(self.current_checkpoint.files_state)
+            if state.status == 'completed' and state.result_data is not None
+        }
+
+    def load_result(self, index: int) -> Optional[Dict]:
+        """获取指定索引文件的已保存结果"""
+        if not self.current_checkpoint:
+            return None
+
+        files_state = self.current_checkpoint.files_state
+        if 0 <= index < len(files_state):
+            return files_state[index].result_data
+        return None
+
     def get_processing_progress(self) -> Dict[str, Any]:
         """获取处理进度信息"""
         if not self.current_checkpoint:
@@ -371,25 +452,24 @@ class CheckpointManager:
                 try:
                     # 读取checkpoint检查是否完成
                     if auto_clean_completed:
-                        with open(checkpoint_file, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            # 自动删除已完成的checkpoint
-                            if data.get('is_completed', False):
-                                checkpoint_file.unlink()
-                                logger.info(f"删除已完成的断点文件: {checkpoint_file.name}")
-                                continue
+                        data = _read_json(checkpoint_file)
+                        # 自动删除已完成的checkpoint
+                        if data.get('is_completed', False):
+                            checkpoint_file.unlink()
+                            logger.info("删除已完成的断点文件: %s", checkpoint_file.name)
+                            continue
                     
                     # 删除过期的checkpoint
                     file_age = current_time - checkpoint_file.stat().st_mtime
                     if file_age > max_age_seconds:
                         checkpoint_file.unlink()
-                        logger.info(f"删除过期断点文件: {checkpoint_file.name}")
+                        logger.info("删除过期断点文件: %s", checkpoint_file.name)
                         
                 except Exception as e:
-                    logger.warning(f"处理checkpoint文件 {checkpoint_file.name} 失败: {e}")
+                    logger.warning("处理checkpoint文件 %s 失败: %s", checkpoint_file.name, e)
                     
         except Exception as e:
-            logger.warning(f"清理断点文件失败: {e}")
+            logger.warning("清理断点文件失败: %s", e)
     
     def delete_checkpoint(self, checkpoint_id: str) -> bool:
         """删除指定的断点文件"""
@@ -397,11 +477,11 @@ class CheckpointManager:
             checkpoint_file = self.checkpoint_dir / f"{checkpoint_id}.json"
             if checkpoint_file.exists():
                 checkpoint_file.unlink()
-                logger.info(f"删除断点文件: {checkpoint_id}")
+                logger.info("删除断点文件: %s", checkpoint_id)
                 return True
             return False
         except Exception as e:
-            logger.error(f"删除断点文件失败 {checkpoint_id}: {e}")
+            logger.error("删除断点文件失败 %s: %s", checkpoint_id, e)
             return False
     
     def get_checkpoint_info(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
@@ -412,10 +492,9 @@ class CheckpointManager:
             return None
         
         try:
-            with open(checkpoint_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return _read_json(checkpoint_file)
         except Exception as e:
-            logger.error(f"读取断点信息失败 {checkpoint_id}: {e}")
+            logger.error("读取断点信息失败 %s: %s", checkpoint_id, e)
             return None
 
 
@@ -428,6 +507,25 @@ def create_checkpoint_manager(checkpoint_dir: str = "checkpoints") -> Checkpoint
     return CheckpointManager(checkpoint_dir)
 
 
+def compute_input_fingerprint(paths: List[Path]) -> str:
+    """
+    计算输入文件集合的指纹
+
+    基于文件名、大小和修改时间，不读取文件内容
+
+    Args:
+        paths: 输入文件路径列表
+
+    Returns:
+        str: sha256十六进制摘要
+    """
+    hash_obj = hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        stat = path.stat()
+        hash_obj.update(f"{path.name}:{stat.st_size}:{int(stat.st_mtime)}\n".encode('utf-8'))
+    return hash_obj.hexdigest()
+
+
 if __name__ == "__main__":
     # 简单测试
     manager = create_checkpoint_manager()
@@ -61,6 +61,21 @@ BATCH_CONFIG = {
     "max_wait_time": 3600,  # 最大等待时间（秒）
     "requests_per_minute": 30,  # 每分钟请求限制（降低）
     "max_concurrent": 10,  # 最大并发请求数（降低以提高稳定性）
+    "max_rpm": None,  # 每分钟最大请求数（按模型配额设置），None表示不限制
+    "max_tpm": None,  # 每分钟最大token数（按模型配额设置），None表示不限制
+    "use_batch_api": False,  # 非交互模式是否通过OpenAI Batch API提交（半价，最长24小时返回）
+    "batch_completion_window": "24h",  # Batch API完成时间窗口
+    "batch_check_interval": 30,  # Batch API状态检查间隔（秒）
+    "batch_max_wait_time": None,  # Batch API最大等待时间（秒），None表示等待至任务结束
+}
+
+# =============================================================================
+# LLM响应缓存配置
+# =============================================================================
+
+CACHE_CONFIG = {
+    "enabled": True,  # 是否缓存模型响应（仅temperature为0的请求，重复运行相同文本时不再调用API）
+    "cache_file": ".cache/llm_cache.sqlite",  # SQLite缓存文件路径
 }
 
 # =============================================================================
@@ -191,7 +206,8 @@ OUTPUT_FORMATS = {
     },
     "excel": {
         "extension": ".xlsx",
-        "description": "Excel格式，带样式和统计信息"
+        "description": "Excel格式，带样式和统计信息",
+        "engine": "auto"  # 写出引擎：auto（已安装xlsxwriter时优先使用）或 openpyxl
     },
     "tbx": {
         "extension": ".tbx",
@@ -218,6 +234,7 @@ TEXT_SPLITTING = {
     "max_chunk_size": 400000,  # 最大块大小（字符）- 约100K tokens，预留28K给输出和提示词
     "min_overlap_size": 100,  # 最小重叠大小（字符）
     "max_overlap_ratio": 0.1,  # 最大重叠比例
+    "prefix_overlap_only": True,  # 只在片段开头添加重叠（每个边界只重复发送一次）
     "enable_whole_document_mode": True,  # 启用整文档模式选项
     "whole_document_threshold": 300000,  # 小于此字符数时可选择整文档处理（约75K tokens）
 }
@@ -269,6 +286,8 @@ FILE_PROCESSING = {
     "supported_pdf_extractors": ["pdfplumber", "pymupdf", "pdfminer"],
     "supported_doc_extractors": ["python-docx", "docx2txt"],
     "fallback_encoding": ["gbk", "gb2312", "latin1"],
+    "save_intermediate_text": False,  # 是否将提取的文本保存到extracted_texts文件夹
+    "max_load_workers": 4,  # 批量处理多个文件时并行加载的文件数
 }
 
 # =============================================================================
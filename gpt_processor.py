@@ -5,23 +5,73 @@ OpenAI GPT批处理术语抽取处理器
 支持并发批量文本处理、任务监控和结果处理
 """
 
+import re
 import json
 import time
+import mmap
+import queue
+import atexit
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import importlib.util
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 from checkpoint_manager import CheckpointManager
+from llm_cache import LLMCache, cache_key
+from rate_limiter import TokenBucket
 
 try:
-    from openai import OpenAI
+    from openai import OpenAI, RateLimitError
     import tiktoken
 except ImportError:
     print("请安装OpenAI库: pip install openai tiktoken")
     raise
 
+# 可选：orjson提供更快的JSON序列化
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 可选：显式配置httpx连接池（openai本身依赖httpx）
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# 可选：lxml提供更快的TBX（XML）序列化
+try:
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+
+# 术语语言检测用的预编译正则
+# 纯ASCII文本不可能包含中文，检测中文前先用O(1)的str.isascii()排除
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+_PURE_EN_RE = re.compile(r'^[a-zA-Z0-9\s\-\(\)\.]+$')
+_LATIN_RE = re.compile(r'[a-zA-Z]')
+
+# TBX命名空间；xml:lang使用Clark写法，标准库ElementTree和lxml均可直接序列化
+_TBX_NAMESPACE = "urn:iso:std:iso:30042:ed-2"
+_XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+# TBX文件头（XML声明和DOCTYPE），预先编码为UTF-8字节
+_TBX_PROLOG = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<!DOCTYPE tbx SYSTEM "TBXcoreStructV02.dtd">\n'
+).encode('utf-8')
+
+# 配置了速率限制时，429错误的最大重试次数（指数退避）
+_RATE_LIMIT_RETRIES = 5
+
 
 class GPTProcessor:
     """OpenAI GPT批处理处理器"""
@@ -31,7 +81,12 @@ class GPTProcessor:
                  base_url: str = "https://api.openai.com/v1", 
                  base_dir: str = "batch_results",
                  enable_checkpoint: bool = True,
-                 checkpoint_dir: str = "checkpoints"):
+                 checkpoint_dir: str = "checkpoints",
+                 enable_cache: bool = True,
+                 cache_file: str = ".cache/llm_cache.sqlite",
+                 max_connections: int = 10,
+                 max_rpm: Optional[int] = None,
+                 max_tpm: Optional[int] = None):
         """
         初始化批处理器
         
@@ -41,12 +96,18 @@ class GPTProcessor:
             base_dir: 结果存储目录
             enable_checkpoint: 是否启用断点功能
             checkpoint_dir: 断点文件目录
+            enable_cache: 是否启用LLM响应缓存（仅temperature为0的请求）
+            cache_file: 响应缓存文件路径
+            max_connections: HTTP连接池大小，与最大并发数一致
+            max_rpm: 每分钟最大请求数，None表示不限制
+            max_tpm: 每分钟最大token数，None表示不限制
         """
         self.client = OpenAI(
             api_key=api_key, 
             base_url=base_url,
             timeout=60.0,  # 设置60秒超时
-            max_retries=3   # 最大重试3次
+            max_retries=3,  # 最大重试3次
+            http_client=self._create_http_client(max_connections)
         )
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(exist_ok=True)
@@ -55,6 +116,12 @@ class GPTProcessor:
         self.enable_checkpoint = enable_checkpoint
         self.checkpoint_manager = CheckpointManager(checkpoint_dir) if enable_checkpoint else None
         
+        # 初始化响应缓存
+        self.llm_cache = LLMCache(cache_file) if enable_cache else None
+        
+        # 初始化速率限制（按RPM和TPM发送请求，未配置时只受并发数限制）
+        self.rate_limiter = TokenBucket(max_rpm, max_tpm) if max_rpm or max_tpm else None
+        
         # 配置日志和并发控制
         self._setup_logging()
         self._setup_concurrency_control()
@@ -63,17 +130,46 @@ class GPTProcessor:
     # 初始化和配置
     # =============================================================================
     
+    @staticmethod
+    def _create_http_client(max_connections: int):
+        """
+        创建连接池大小与并发数一致的HTTP客户端
+        
+        客户端随处理器实例复用，各阶段的请求共享同一连接池，不重复进行TLS握手
+        
+        Returns:
+            httpx.Client，httpx不可用时返回None（使用openai默认客户端）
+        """
+        if not HTTPX_AVAILABLE:
+            return None
+        return httpx.Client(limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        ))
+    
     def _setup_logging(self):
         """设置日志配置"""
         log_file = self.base_dir / "gpt_processor.log"
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        root_logger = logging.getLogger()
+        self._log_listener = None
+        
+        # 与basicConfig一致：根日志器已有处理器时不重复配置
+        if not root_logger.handlers:
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            stream_handler = logging.StreamHandler()
+            file_handler.setFormatter(formatter)
+            stream_handler.setFormatter(formatter)
+            
+            # 工作线程只将日志记录放入队列，文件和控制台写入由后台监听线程完成
+            log_queue = queue.Queue(-1)
+            root_logger.addHandler(QueueHandler(log_queue))
+            root_logger.setLevel(logging.INFO)
+            
+            self._log_listener = QueueListener(log_queue, file_handler, stream_handler)
+            self._log_listener.start()
+            atexit.register(self._log_listener.stop)
+        
         self.logger = logging.getLogger(__name__)
     
     def _setup_concurrency_control(self):
@@ -126,33 +222,75 @@ class GPTProcessor:
         Returns:
             处理结果字典
         """
-        with self.semaphore:  # 控制并发数
+        try:
+            # 验证必要参数
+            if system_prompt is None:
+                raise ValueError("system_prompt is required")
+            
+            if user_prompt_template is None:
+                raise ValueError("user_prompt_template is required")
+            
+            # 构建API调用参数（纯CPU工作，无需占用并发名额）
+            api_params = self._build_api_params(
+                system_prompt, user_prompt_template, text, model, temperature, max_tokens
+            )
+            
+            # 相同请求已有缓存响应时直接返回，不调用API
+            key = cache_key(api_params) if self.llm_cache else None
+            if key:
+                cached = self.llm_cache.get(key)
+                if cached:
+                    self.logger.info("💾 %s 命中响应缓存", custom_id)
+                    return self._process_api_response(cached["content"], custom_id, cached["model"], source_file)
+            
+            # 记录处理信息（token计数用于日志和TPM限制，两者都不需要时跳过）
+            log_enabled = self.logger.isEnabledFor(logging.INFO)
+            total_tokens = 0
+            if log_enabled or (self.rate_limiter and self.rate_limiter.tpm):
+                total_tokens = self.count_tokens(system_prompt + api_params["messages"][1]["content"], model)
+            if log_enabled:
+                self.logger.info("处理 %s: 输入 %d tokens", custom_id, total_tokens)
+            
+            response = self._create_completion(api_params, custom_id, total_tokens + max_tokens)
+            
+            # 处理响应
+            result = self._process_api_response(response, custom_id, model, source_file)
+            
+            if key:
+                self._store_cached_response(key, response.choices[0].message.content, result)
+            
+            return result
+            
+        except Exception as e:
+            self.logger.error("❌ %s 处理失败: %s", custom_id, e)
+            return self._create_error_result(custom_id, model, source_file, str(e))
+    
+    def _create_completion(self, api_params: Dict[str, Any], custom_id: str, request_tokens: int):
+        """
+        发送API请求
+        
+        配置了速率限制时先从令牌桶获取配额；触发429错误后降低请求速率并指数退避重试
+        
+        Args:
+            api_params: API调用参数
+            custom_id: 自定义ID
+            request_tokens: 请求预计消耗的token数（输入+最大输出）
+        """
+        for attempt in range(_RATE_LIMIT_RETRIES + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire(request_tokens)
+            
             try:
-                # 验证必要参数
-                if system_prompt is None:
-                    raise ValueError("system_prompt is required")
-                
-                if user_prompt_template is None:
-                    raise ValueError("user_prompt_template is required")
-                
-                # 构建API调用参数
-                api_params = self._build_api_params(
-                    system_prompt, user_prompt_template, text, model, temperature, max_tokens
-                )
-                
-                # 记录处理信息
-                total_tokens = self.count_tokens(system_prompt + user_prompt_template.format(text=text), model)
-                self.logger.info(f"处理 {custom_id}: 输入 {total_tokens} tokens")
-                
-                # 调用API
-                response = self.client.chat.completions.create(**api_params)
-                
-                # 处理响应
-                return self._process_api_response(response, custom_id, model, source_file)
-                
-            except Exception as e:
-                self.logger.error(f"❌ {custom_id} 处理失败: {e}")
-                return self._create_error_result(custom_id, model, source_file, str(e))
+                # 信号量只限制同时在途的API请求数
+                with self.semaphore:
+                    return self.client.chat.completions.create(**api_params)
+            except RateLimitError:
+                if not self.rate_limiter or attempt == _RATE_LIMIT_RETRIES:
+                    raise
+                self.rate_limiter.penalize()
+                delay = 2 ** attempt
+                self.logger.warning("⏳ %s 触发速率限制，%d秒后重试", custom_id, delay)
+                time.sleep(delay)
     
     def _build_api_params(self, system_prompt: str, user_prompt_template: str, text: str, 
                          model: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
@@ -204,7 +342,7 @@ class GPTProcessor:
             "created": int(time.time())
         }
         
-        self.logger.info(f"✅ {custom_id} 处理完成: {usage_info.get('total_tokens', 0)} tokens")
+        self.logger.info("✅ %s 处理完成: %d tokens", custom_id, usage_info.get('total_tokens', 0))
         return result
     
     def _parse_json_response(self, content: str) -> Dict[str, Any]:
@@ -272,36 +410,71 @@ class GPTProcessor:
         Returns:
             处理结果列表
         """
-        self.logger.info(f"🚀 开始并发批处理: {len(texts)} 个文本，最大并发 {max_concurrent}")
+        self.logger.info("🚀 开始并发批处理: %d 个文本，最大并发 %d", len(texts), max_concurrent)
         
         # 更新并发控制
         self.semaphore = threading.Semaphore(max_concurrent)
         
         results = []
         
+        # 复用断点中已完成的结果，只提交未完成的文本
+        reused_results = self._load_completed_results(texts, source_files)
+        if reused_results:
+            self.logger.info("♻️ 复用断点中已完成的结果: %d 个", len(reused_results))
+        
+        # 命中响应缓存的文本直接得到结果，不再提交到线程池
+        reused_results.update(self._load_cached_results(
+            texts, reused_results, system_prompt, user_prompt_template,
+            model, temperature, max_tokens, source_files
+        ))
+        
+        # 按提示词前缀和文本长度排序提交顺序，提高服务端前缀缓存命中率
+        submit_order = [i for i in self._order_for_prefix_cache(texts) if i not in reused_results]
+        
         with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
             # 提交所有任务
             future_to_id = self._submit_batch_tasks(
                 executor, texts, system_prompt, user_prompt_template, 
-                model, temperature, max_tokens, source_files
+                model, temperature, max_tokens, source_files, submit_order
             )
             
             # 收集结果
-            results = self._collect_batch_results(future_to_id, len(texts), model, source_files)
+            results = self._collect_batch_results(future_to_id, len(submit_order), model, source_files)
+        
+        results.extend(reused_results.values())
         
         # 按custom_id排序结果
         results.sort(key=lambda x: x.get("custom_id", ""))
         
-        self.logger.info(f"✅ 并发批处理完成: {len(results)} 个结果")
+        self.logger.info("✅ 并发批处理完成: %d 个结果", len(results))
         return results
     
+    def _order_for_prefix_cache(self, texts: List[str]) -> List[int]:
+        """
+        计算任务提交顺序
+        
+        OpenAI的提示词缓存只在相同前缀被连续命中时生效。同一批次的请求共享
+        系统提示词和用户提示词模板前缀，因此按文本长度分桶后连续提交，
+        使长度相近的请求落在同一服务端、缓存保持热状态。
+        输出顺序不受影响（结果最终按custom_id排序）。
+        
+        Returns:
+            List[int]: 按提交顺序排列的文本索引
+        """
+        return sorted(range(len(texts)), key=lambda i: len(texts[i]) // 512)
+    
     def _submit_batch_tasks(self, executor, texts: List[str], system_prompt: str, 
                            user_prompt_template: str, model: str, temperature: float, 
-                           max_tokens: int, source_files: List[str]) -> Dict:
+                           max_tokens: int, source_files: List[str],
+                           submit_order: Optional[List[int]] = None) -> Dict:
         """提交批处理任务"""
         future_to_id = {}
         
-        for i, text in enumerate(texts):
+        if submit_order is None:
+            submit_order = range(len(texts))
+        
+        for i in submit_order:
+            text = texts[i]
             custom_id = f"term-extraction-{i+1}"
             source_file = source_files[i] if source_files and i < len(source_files) else None
             
@@ -320,6 +493,82 @@ class GPTProcessor:
         
         return future_to_id
     
+    def _load_completed_results(self, texts: List[str], source_files: List[str]) -> Dict[int, Dict[str, Any]]:
+        """
+        从当前断点加载已完成文本的结果
+        
+        Returns:
+            Dict[int, Dict[str, Any]]: {文本索引: 处理结果}
+        """
+        if not self.enable_checkpoint or not self.checkpoint_manager:
+            return {}
+        
+        virtual_files = self._build_virtual_files(texts, source_files or [])
+        if not self.checkpoint_manager.matches_checkpoint(virtual_files, file_hashes=self._hash_texts(texts)):
+            return {}
+        
+        reused_results = {}
+        for i in self.checkpoint_manager.get_completed_indices():
+            result = self.checkpoint_manager.load_result(i)
+            # 请求失败时错误结果同样会被记为completed，这类结果需要重新处理
+            if result and "error" not in result:
+                reused_results[i] = result
+        
+        return reused_results
+    
+    def _load_cached_results(self, texts: List[str], skip: Dict[int, Any], system_prompt: str,
+                             user_prompt_template: str, model: str, temperature: float,
+                             max_tokens: int, source_files: List[str]) -> Dict[int, Dict[str, Any]]:
+        """
+        从响应缓存中取出命中的文本结果，并记录到断点
+        
+        Args:
+            skip: 已有结果、无需查询缓存的文本索引
+            
+        Returns:
+            Dict[int, Dict[str, Any]]: {文本索引: 处理结果}
+        """
+        if not self.llm_cache or system_prompt is None or user_prompt_template is None:
+            return {}
+        
+        cached_results = {}
+        for i, text in enumerate(texts):
+            if i in skip:
+                continue
+            
+            api_params = self._build_api_params(
+                system_prompt, user_prompt_template, text, model, temperature, max_tokens
+            )
+            key = cache_key(api_params)
+            if key is None:
+                # 同一批次参数相同，一个请求不可缓存则全部不可缓存
+                return {}
+            
+            cached = self.llm_cache.get(key)
+            if not cached:
+                continue
+            
+            custom_id = f"term-extraction-{i+1}"
+            source_file = source_files[i] if source_files and i < len(source_files) else None
+            result = self._process_api_response(cached["content"], custom_id, cached["model"], source_file)
+            cached_results[i] = result
+            
+            self.update_text_processing_status(
+                text_index=i,
+                source_file=source_file or f"text_{i+1}.txt",
+                status='completed',
+                result_data=result
+            )
+        
+        if cached_results:
+            self.logger.info("💾 命中响应缓存: %d 个文本无需请求API", len(cached_results))
+        return cached_results
+    
+    def _store_cached_response(self, key: str, content: str, result: Dict[str, Any]):
+        """缓存模型响应（只缓存能解析为JSON的响应，解析失败的请求下次重新调用）"""
+        if "raw_content" not in result["extracted_terms"]:
+            self.llm_cache.set(key, {"content": content, "model": result["model"]})
+    
     def _collect_batch_results(self, future_to_id: Dict, total_count: int, 
                               model: str, source_files: List[str]) -> List[Dict[str, Any]]:
         """收集批处理结果"""
@@ -332,7 +581,7 @@ class GPTProcessor:
                 result = future.result()
                 results.append(result)
                 completed_count += 1
-                self.logger.info(f"📊 进度: {completed_count}/{total_count} 完成")
+                self.logger.info("📊 进度: %d/%d 完成", completed_count, total_count)
                 
                 # 更新断点状态 - 成功
                 text_index = int(custom_id.split('-')[-1]) - 1
@@ -345,7 +594,7 @@ class GPTProcessor:
                 )
                 
             except Exception as e:
-                self.logger.error(f"❌ {custom_id} 处理异常: {e}")
+                self.logger.error("❌ %s 处理异常: %s", custom_id, e)
                 # 添加错误结果
                 text_index = int(custom_id.split('-')[-1]) - 1
                 source_file = source_files[text_index] if source_files and text_index < len(source_files) else f"text_{text_index+1}.txt"
@@ -361,6 +610,134 @@ class GPTProcessor:
         
         return results
     
+    # =============================================================================
+    # Batch API处理
+    # =============================================================================
+    
+    def process_batch_api(self, 
+                          texts: List[str],
+                          system_prompt: str = None,
+                          user_prompt_template: str = None,
+                          model: str = "gpt-4-turbo-preview",
+                          temperature: float = 0.1,
+                          max_tokens: int = 4096,
+                          source_files: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        通过OpenAI Batch API处理批量文本
+        
+        所有请求写入一个JSONL文件一次性提交，等待任务结束后下载输出，
+        结果格式与process_batch_concurrent一致
+        
+        Args:
+            texts: 要处理的文本列表
+            system_prompt: 系统提示词
+            user_prompt_template: 用户提示词模板
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大输出token数
+            source_files: 来源文件名列表
+            
+        Returns:
+            处理结果列表
+        """
+        from config import BATCH_CONFIG
+        from batch_submit import submit_batch, wait_for_batch, download_batch_output, parse_batch_record
+        
+        if system_prompt is None:
+            raise ValueError("system_prompt is required")
+        
+        if user_prompt_template is None:
+            raise ValueError("user_prompt_template is required")
+        
+        self.logger.info("🚀 开始Batch API批处理: %d 个文本", len(texts))
+        
+        # 复用断点中已完成的结果，只提交未完成的文本
+        reused_results = self._load_completed_results(texts, source_files)
+        if reused_results:
+            self.logger.info("♻️ 复用断点中已完成的结果: %d 个", len(reused_results))
+        
+        # 命中响应缓存的文本不再提交到Batch API
+        reused_results.update(self._load_cached_results(
+            texts, reused_results, system_prompt, user_prompt_template,
+            model, temperature, max_tokens, source_files
+        ))
+        
+        pending = [i for i in range(len(texts)) if i not in reused_results]
+        results = list(reused_results.values())
+        
+        if pending:
+            requests = [
+                {
+                    "custom_id": f"term-extraction-{i+1}",
+                    "body": self._build_api_params(
+                        system_prompt, user_prompt_template, texts[i], model, temperature, max_tokens
+                    )
+                }
+                for i in pending
+            ]
+            
+            batch_id = submit_batch(
+                self.client, requests,
+                completion_window=BATCH_CONFIG.get("batch_completion_window", "24h")
+            )
+            batch = wait_for_batch(
+                self.client, batch_id,
+                check_interval=BATCH_CONFIG.get("batch_check_interval", 30),
+                max_wait_time=BATCH_CONFIG.get("batch_max_wait_time")
+            )
+            outputs = download_batch_output(self.client, batch)
+            
+            for i, request in zip(pending, requests):
+                custom_id = request["custom_id"]
+                source_file = source_files[i] if source_files and i < len(source_files) else None
+                body = parse_batch_record(outputs.get(custom_id))
+                
+                if "error" in body:
+                    self.logger.error("❌ %s 处理失败: %s", custom_id, body["error"])
+                    result = self._create_error_result(custom_id, model, source_file, body["error"])
+                    status = 'failed'
+                else:
+                    result = self._result_from_batch_body(body, custom_id, model, source_file)
+                    status = 'completed'
+                    key = cache_key(request["body"]) if self.llm_cache else None
+                    if key:
+                        self._store_cached_response(key, body["choices"][0]["message"]["content"], result)
+                results.append(result)
+                
+                # 更新断点状态
+                self.update_text_processing_status(
+                    text_index=i,
+                    source_file=source_file or f"text_{i+1}.txt",
+                    status=status,
+                    result_data=result if status == 'completed' else None,
+                    error_message=result.get("error")
+                )
+        
+        # 按custom_id排序结果
+        results.sort(key=lambda x: x.get("custom_id", ""))
+        
+        self.logger.info("✅ Batch API批处理完成: %d 个结果", len(results))
+        return results
+    
+    def _result_from_batch_body(self, body: Dict[str, Any], custom_id: str, 
+                                model: str, source_file: str) -> Dict[str, Any]:
+        """将批处理输出中的Chat Completions响应体转换为处理结果"""
+        usage = body.get("usage") or {}
+        content = body["choices"][0]["message"]["content"] or ""
+        
+        return {
+            "custom_id": custom_id,
+            "extracted_terms": self._parse_json_response(content),
+            "usage": {
+                "total_tokens": usage.get("total_tokens", 0),
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0)
+            },
+            "model": body.get("model", model),
+            "source_file": source_file,
+            "created": body.get("created") or int(time.time())
+        }
+    
     # =============================================================================
     # 术语去重和合并
     # =============================================================================
@@ -388,7 +765,7 @@ class GPTProcessor:
         # 创建合并结果
         merged_result = self._create_merged_result(results, merged_terms, duplicate_count)
         
-        self.logger.info(f"去重完成: {len(merged_terms)} 个唯一术语 (移除 {duplicate_count} 个重复)")
+        self.logger.info("去重完成: %d 个唯一术语 (移除 %d 个重复)", len(merged_terms), duplicate_count)
         return [merged_result]
     
     def _collect_all_terms(self, results: List[Dict[str, Any]]) -> Dict[str, List[Dict]]:
@@ -538,11 +915,11 @@ class GPTProcessor:
     
     def _collect_source_files(self, term_list: List[Dict]) -> List[str]:
         """收集来源文件列表"""
-        return list(set([
-            term_info.get("source_file", "") 
-            for term_info in term_list 
+        return list({
+            term_info["source_file"]
+            for term_info in term_list
             if term_info.get("source_file")
-        ]))
+        })
     
     def _extract_source_filename(self, source_files: List[str]) -> str:
         """从源文件列表中提取主要文件名（不含扩展名和路径）"""
@@ -553,7 +930,6 @@ class GPTProcessor:
         main_file = source_files[0]
         
         # 处理虚拟文件名格式，如 "filename.pdf - 片段 1/5 (2621 tokens)"
-        import re
         # 移除片段信息，只保留原始文件名部分
         clean_main_file = re.sub(r'\s*-\s*片段\s*\d+/\d+\s*\([^)]+\)', '', main_file)
         
@@ -618,7 +994,8 @@ class GPTProcessor:
         elif output_format == "txt":
             return self._save_txt_results(results, filename_base)
         elif output_format == "excel":
-            return self._save_excel_results(results, filename_base)
+            # 复用已统计的总术语数（0表示调用方未统计）
+            return self._save_excel_results(results, filename_base, total_terms or None)
         elif output_format == "tbx":
             return self._save_tbx_results(results, filename_base)
         else:
@@ -630,7 +1007,7 @@ class GPTProcessor:
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
         
-        self.logger.info(f"结果已保存到: {output_file}")
+        self.logger.info("结果已保存到: %s", output_file)
         return str(output_file)
     
     def _save_csv_results(self, results: List[Dict[str, Any]], filename_base: str) -> str:
@@ -656,7 +1033,7 @@ class GPTProcessor:
                             if not eng_term and not zh_term:
                                 single_term = term.get("term", "")
                                 # 简单判断：如果包含中文字符，放入中文列
-                                if any('\u4e00' <= char <= '\u9fff' for char in single_term):
+                                if not single_term.isascii() and _CJK_RE.search(single_term):
                                     zh_term = single_term
                                 else:
                                     eng_term = single_term
@@ -680,7 +1057,7 @@ class GPTProcessor:
                             result.get("usage", {}).get("total_tokens", 0)
                         ])
         
-        self.logger.info(f"结果已保存到: {output_file}")
+        self.logger.info("结果已保存到: %s", output_file)
         return str(output_file)
     
     def _save_txt_results(self, results: List[Dict[str, Any]], filename_base: str) -> str:
@@ -718,71 +1095,94 @@ class GPTProcessor:
                 
                 f.write("="*50 + "\n\n")
         
-        self.logger.info(f"结果已保存到: {output_file}")
+        self.logger.info("结果已保存到: %s", output_file)
         return str(output_file)
     
-    def _save_excel_results(self, results: List[Dict[str, Any]], filename_base: str) -> str:
-        """保存Excel格式结果"""
-        try:
-            import openpyxl
-            from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-            from openpyxl.utils import get_column_letter
-        except ImportError:
-            raise ImportError("需要安装openpyxl库: pip install openpyxl")
+    def _save_excel_results(self, results: List[Dict[str, Any]], filename_base: str,
+                            total_terms: Optional[int] = None) -> str:
+        """
+        保存Excel格式结果
+        
+        Args:
+            results: 处理结果列表
+            filename_base: 输出文件名（不含扩展名）
+            total_terms: 已统计的总术语数，None时使用导出的行数
+        """
+        from config import OUTPUT_FORMATS
         
         output_file = self.base_dir / f"{filename_base}.xlsx"
         
-        # 创建工作簿和工作表
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "术语抽取结果"
+        # 标题行（双语）
+        headers = ["序号", "英文术语", "中文术语", "来源文件", "模型", "Token使用", "处理时间"]
         
-        # 设置样式
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin")
-        )
+        # 收集数据行并同时统计各列最大宽度（列宽需在写入首行之前设置，因此先收集）
+        rows, term_count, col_widths, total_tokens = self._build_excel_rows(results, headers)
         
-        # 写入标题行（双语）
-        headers = ["序号", "英文术语", "中文术语", "来源文件", "模型", "Token使用", "处理时间"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        # 写入数据
-        row_num = 2
+        # 设置列宽，最小10，最大50
+        col_widths = [min(max(max_length + 2, 10), 50) for max_length in col_widths]
+        
+        stats_data = [
+            ["统计项目", "数值"],
+            ["总术语数", term_count if total_terms is None else total_terms],
+            ["处理结果数", len(results)],
+            ["总Token使用", total_tokens],
+            ["生成时间", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+        ]
+        
+        # 选择写出引擎：xlsxwriter逐行流式写出更快，未安装时回退到openpyxl
+        engine = OUTPUT_FORMATS.get("excel", {}).get("engine", "auto")
+        if engine != "openpyxl" and importlib.util.find_spec("xlsxwriter") is not None:
+            self._write_excel_with_xlsxwriter(output_file, headers, rows, col_widths, stats_data)
+        else:
+            self._write_excel_with_openpyxl(output_file, headers, rows, col_widths, stats_data)
+        
+        self.logger.info("Excel结果已保存到: %s", output_file)
+        return str(output_file)
+    
+    def _build_excel_rows(self, results: List[Dict[str, Any]],
+                          headers: List[str]) -> Tuple[List[tuple], int, List[int], int]:
+        """
+        构建Excel数据行
+        
+        Returns:
+            Tuple[List[tuple], int, List[int], int]: (数据行列表, 术语总数, 各列最大内容长度, 总Token使用)
+        """
+        rows = []
         term_count = 0
+        total_tokens = 0
+        col_widths = [len(header) for header in headers]
+        
+        def add_row(row_data):
+            """添加数据行并更新各列最大宽度"""
+            rows.append(row_data)
+            for col, value in enumerate(row_data):
+                length = len(str(value))
+                if length > col_widths[col]:
+                    col_widths[col] = length
         
         for result in results:
+            # 同一结果内所有术语共享的字段只计算一次
+            model = result.get('model', '')
+            tokens = result.get('usage', {}).get('total_tokens', 0)
+            total_tokens += tokens
+            default_source_file = result.get('source_file') or ""
+            created_time = ""
+            if result.get('created'):
+                created_time = datetime.fromtimestamp(result['created']).strftime("%Y-%m-%d %H:%M:%S")
+            
             terms = result.get("extracted_terms", {})
             if "terms" in terms and isinstance(terms["terms"], list):
-                for term in terms["terms"]:
-                    term_count += 1
-                    
+                # 序号跨结果连续编号；术语列表为空时term_count保持不变
+                for term_count, term in enumerate(terms["terms"], term_count + 1):
                     # 处理来源文件信息
-                    source_file = ""
-                    if term.get('source_files'):
-                        if isinstance(term['source_files'], list):
-                            source_file = "; ".join(term['source_files'])
+                    source_files = term.get('source_files')
+                    if source_files:
+                        if isinstance(source_files, list):
+                            source_file = "; ".join(source_files)
                         else:
-                            source_file = str(term['source_files'])
-                    elif term.get('source_file'):
-                        source_file = term['source_file']
-                    elif result.get('source_file'):
-                        source_file = result['source_file']
-                    
-                    # 处理时间
-                    created_time = ""
-                    if result.get('created'):
-                        created_time = datetime.fromtimestamp(result['created']).strftime("%Y-%m-%d %H:%M:%S")
+                            source_file = str(source_files)
+                    else:
+                        source_file = term.get('source_file') or default_source_file
                     
                     # 支持双语格式
                     eng_term = term.get("eng_term", "")
@@ -792,116 +1192,168 @@ class GPTProcessor:
                     if not eng_term and not zh_term:
                         single_term = term.get("term", "")
                         # 简单判断：如果包含中文字符，放入中文列
-                        if any('\u4e00' <= char <= '\u9fff' for char in single_term):
+                        if not single_term.isascii() and _CJK_RE.search(single_term):
                             zh_term = single_term
                         else:
                             eng_term = single_term
                     
-                    # 写入行数据
-                    row_data = [
+                    add_row((
                         term_count,  # 序号
                         eng_term,  # 英文术语
                         zh_term,  # 中文术语
                         source_file,  # 来源文件
-                        result.get('model', ''),  # 模型
-                        result.get('usage', {}).get('total_tokens', 0),  # Token使用
+                        model,  # 模型
+                        tokens,  # Token使用
                         created_time  # 处理时间
-                    ]
-                    
-                    for col, value in enumerate(row_data, 1):
-                        cell = ws.cell(row=row_num, column=col, value=value)
-                        cell.border = border
-                        # 居中对齐序号和Token使用列
-                        if col in [1, 6]:
-                            cell.alignment = Alignment(horizontal="center")
-                    
-                    row_num += 1
+                    ))
             else:
-                # 处理其他格式的数据
+                # 处理其他格式的数据（原始内容放入英文术语列，其余列与标题对齐）
                 term_count += 1
                 raw_content = terms.get('raw_content', '无内容')
                 
-                row_data = [
+                add_row((
                     term_count,
                     raw_content[:100] + "..." if len(raw_content) > 100 else raw_content,
-                    result.get('source_file', ''),
-                    result.get('model', ''),
-                    result.get('usage', {}).get('total_tokens', 0),
+                    "",
+                    default_source_file,
+                    model,
+                    tokens,
                     ""
-                ]
-                
-                for col, value in enumerate(row_data, 1):
-                    cell = ws.cell(row=row_num, column=col, value=value)
-                    cell.border = border
-                    if col in [1, 5]:
-                        cell.alignment = Alignment(horizontal="center")
-                
-                row_num += 1
+                ))
         
-        # 自动调整列宽
-        for col in range(1, len(headers) + 1):
-            column_letter = get_column_letter(col)
-            max_length = 0
+        return rows, term_count, col_widths, total_tokens
+    
+    def _write_excel_with_xlsxwriter(self, output_file: Path, headers: List[str], rows: List[tuple],
+                                     col_widths: List[int], stats_data: List[list]):
+        """使用xlsxwriter写出Excel（常量内存模式，逐行写出）"""
+        import xlsxwriter
+        
+        wb = xlsxwriter.Workbook(str(output_file), {'constant_memory': True})
+        try:
+            # 设置样式（预先创建格式对象，所有单元格复用）
+            header_fmt = wb.add_format({
+                'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#366092',
+                'align': 'center', 'valign': 'vcenter', 'border': 1
+            })
+            border_fmt = wb.add_format({'border': 1})
+            center_fmt = wb.add_format({'border': 1, 'align': 'center'})
+            
+            ws = wb.add_worksheet("术语抽取结果")
+            for col, width in enumerate(col_widths):
+                ws.set_column(col, col, width)
             
-            for row in ws[column_letter]:
-                try:
-                    if len(str(row.value)) > max_length:
-                        max_length = len(str(row.value))
-                except:
-                    pass
+            # 写入标题行和数据行（居中对齐序号和Token使用列）
+            ws.write_row(0, 0, headers, header_fmt)
+            for row_num, row_data in enumerate(rows, 1):
+                ws.write_row(row_num, 0, row_data, border_fmt)
+                ws.write(row_num, 0, row_data[0], center_fmt)
+                ws.write(row_num, 5, row_data[5], center_fmt)
             
-            # 设置列宽，最小10，最大50
-            adjusted_width = min(max(max_length + 2, 10), 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+            # 添加统计信息工作表
+            stats_ws = wb.add_worksheet("统计信息")
+            stats_ws.set_column(0, 1, 15)
+            stats_ws.write_row(0, 0, stats_data[0], header_fmt)
+            for row_num, row_data in enumerate(stats_data[1:], 1):
+                stats_ws.write_row(row_num, 0, row_data, border_fmt)
+        finally:
+            wb.close()
+    
+    def _write_excel_with_openpyxl(self, output_file: Path, headers: List[str], rows: List[tuple],
+                                   col_widths: List[int], stats_data: List[list]):
+        """使用openpyxl只写模式写出Excel"""
+        try:
+            import openpyxl
+            from openpyxl.cell import WriteOnlyCell
+            from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+            from openpyxl.utils import get_column_letter
+        except ImportError:
+            raise ImportError("需要安装openpyxl库: pip install openpyxl")
         
-        # 添加统计信息工作表
-        stats_ws = wb.create_sheet("统计信息")
-        stats_data = [
-            ["统计项目", "数值"],
-            ["总术语数", term_count],
-            ["处理结果数", len(results)],
-            ["总Token使用", sum(r.get('usage', {}).get('total_tokens', 0) for r in results)],
-            ["生成时间", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-        ]
+        # 创建只写模式工作簿：按行流式写出，不为每个单元格构建完整的Cell对象
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("术语抽取结果")
         
-        for row_idx, row_data in enumerate(stats_data, 1):
-            for col_idx, value in enumerate(row_data, 1):
-                cell = stats_ws.cell(row=row_idx, column=col_idx, value=value)
-                if row_idx == 1:  # 标题行
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
+        # 设置样式（所有单元格共享同一组样式对象）
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header_alignment = Alignment(horizontal="center", vertical="center")
+        center_alignment = Alignment(horizontal="center")
+        border = Border(
+            left=Side(style="thin"),
+            right=Side(style="thin"),
+            top=Side(style="thin"),
+            bottom=Side(style="thin")
+        )
+        
+        def header_row(sheet, values):
+            """构建标题行单元格"""
+            row = []
+            for value in values:
+                cell = WriteOnlyCell(sheet, value=value)
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+                cell.border = border
+                row.append(cell)
+            return row
+        
+        def data_row(sheet, values, center_columns):
+            """构建数据行单元格"""
+            row = []
+            for col, value in enumerate(values):
+                cell = WriteOnlyCell(sheet, value=value)
                 cell.border = border
+                if col in center_columns:
+                    cell.alignment = center_alignment
+                row.append(cell)
+            return row
+        
+        for col, width in enumerate(col_widths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+        
+        # 写入标题行和数据行（居中对齐序号和Token使用列）
+        ws.append(header_row(ws, headers))
+        center_columns = (0, 5)
+        for row_data in rows:
+            ws.append(data_row(ws, row_data, center_columns))
+        
+        # 添加统计信息工作表
+        stats_ws = wb.create_sheet("统计信息")
         
         # 调整统计信息表列宽
         for col in range(1, 3):
-            column_letter = get_column_letter(col)
-            stats_ws.column_dimensions[column_letter].width = 15
+            stats_ws.column_dimensions[get_column_letter(col)].width = 15
+        
+        stats_ws.append(header_row(stats_ws, stats_data[0]))
+        for row_data in stats_data[1:]:
+            stats_ws.append(data_row(stats_ws, row_data, ()))
         
         # 保存文件
         wb.save(output_file)
-        
-        self.logger.info(f"Excel结果已保存到: {output_file}")
-        return str(output_file)
     
     def _save_tbx_results(self, results: List[Dict[str, Any]], filename_base: str) -> str:
-        """保存TBX格式结果"""
-        import xml.etree.ElementTree as ET
-        from xml.dom import minidom
-        import re
+        """保存TBX格式结果（已安装lxml时使用lxml构建和序列化）"""
+        if LXML_AVAILABLE:
+            ET = lxml_etree
+        else:
+            import xml.etree.ElementTree as ET
         
         output_file = self.base_dir / f"{filename_base}.tbx"
         
-        # 智能检测主要语言
-        primary_language = self._detect_primary_language(results)
+        # 生成时间只取一次，头部各处时间保持一致
+        now = datetime.now()
         
-        # 创建TBX根元素
-        root = ET.Element("tbx", attrib={
+        # 创建TBX根元素（主要语言在遍历术语时统计，写出前再设置）
+        root_attrib = {
             "type": "TBX-Default",
             "style": "dct",
-            "xml:lang": primary_language,
-            "xmlns": "urn:iso:std:iso:30042:ed-2"
-        })
+            _XML_LANG: ""
+        }
+        if LXML_AVAILABLE:
+            # lxml不允许以普通属性声明命名空间，需通过nsmap设置默认命名空间
+            root = ET.Element("tbx", attrib=root_attrib, nsmap={None: _TBX_NAMESPACE})
+        else:
+            root = ET.Element("tbx", attrib={**root_attrib, "xmlns": _TBX_NAMESPACE})
         
         # 添加TBX头部信息
         tbx_header = ET.SubElement(root, "tbxHeader")
@@ -915,7 +1367,7 @@ class GPTProcessor:
         # 发布信息
         pub_stmt = ET.SubElement(file_desc, "publicationStmt")
         publisher = ET.SubElement(pub_stmt, "p")
-        publisher.text = f"Generated by GPT Term Extraction Tool on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        publisher.text = f"Generated by GPT Term Extraction Tool on {now.strftime('%Y-%m-%d %H:%M:%S')}"
         
         # 源描述
         source_desc = ET.SubElement(file_desc, "sourceDesc")
@@ -931,7 +1383,7 @@ class GPTProcessor:
         revision_desc = ET.SubElement(tbx_header, "revisionDesc")
         change = ET.SubElement(revision_desc, "change")
         change_date = ET.SubElement(change, "date")
-        change_date.text = datetime.now().strftime("%Y-%m-%d")
+        change_date.text = now.strftime("%Y-%m-%d")
         change_resp = ET.SubElement(change, "respName")
         change_resp.text = "GPT Term Extraction Tool"
         change_item = ET.SubElement(change, "item", attrib={"type": "create"})
@@ -941,14 +1393,27 @@ class GPTProcessor:
         text_body = ET.SubElement(root, "text")
         body = ET.SubElement(text_body, "body")
         
-        # 处理术语数据
+        # 处理术语数据，同时统计中英文术语数用于检测主要语言
         term_count = 0
+        chinese_count = 0
+        english_count = 0
+        # 未统计术语数量的上界；主要语言确定后不再对后续术语做语言判断
+        remaining = sum(
+            len(result["extracted_terms"]["terms"]) for result in results
+            if isinstance(result.get("extracted_terms", {}).get("terms"), list)
+        )
+        primary_language = None
         for result in results:
+            # 同一结果内所有术语共享的字段只计算一次
+            default_source_file = result.get('source_file') or ""
+            created_date = ""
+            if result.get('created'):
+                created_date = datetime.fromtimestamp(result['created']).strftime("%Y-%m-%d")
+            
             terms = result.get("extracted_terms", {})
             if "terms" in terms and isinstance(terms["terms"], list):
-                for term in terms["terms"]:
-                    term_count += 1
-                    
+                # 序号跨结果连续编号；术语列表为空时term_count保持不变
+                for term_count, term in enumerate(terms["terms"], term_count + 1):
                     # 创建术语条目
                     term_entry = ET.SubElement(body, "termEntry", attrib={"id": f"term_{term_count}"})
                     
@@ -958,16 +1423,14 @@ class GPTProcessor:
                     admin.text = "military_aerospace"
                     
                     # 处理来源文件信息
-                    source_file = ""
-                    if term.get('source_files'):
-                        if isinstance(term['source_files'], list):
-                            source_file = "; ".join(term['source_files'])
+                    source_files = term.get('source_files')
+                    if source_files:
+                        if isinstance(source_files, list):
+                            source_file = "; ".join(source_files)
                         else:
-                            source_file = str(term['source_files'])
-                    elif term.get('source_file'):
-                        source_file = term['source_file']
-                    elif result.get('source_file'):
-                        source_file = result['source_file']
+                            source_file = str(source_files)
+                    else:
+                        source_file = term.get('source_file') or default_source_file
                     
                     if source_file:
                         source_admin = ET.SubElement(admin_grp, "admin", attrib={"type": "source"})
@@ -981,84 +1444,116 @@ class GPTProcessor:
                     eng_term = term.get("eng_term", "")
                     zh_term = term.get("zh_term", "")
                     
+                    # 统计主要语言（与_detect_primary_language规则一致）
+                    single_term = term.get('term', '')
+                    if primary_language is None:
+                        remaining -= 1
+                        if single_term:
+                            if not single_term.isascii() and _CJK_RE.search(single_term):
+                                chinese_count += 1
+                            elif _PURE_EN_RE.search(single_term):
+                                english_count += 1
+                        primary_language = self._decided_primary_language(
+                            chinese_count, english_count, remaining)
+                    
+                    # 记录最后创建的termGrp，用于添加提取时间
+                    last_term_grp = None
+                    
                     # 兼容旧格式
                     if not eng_term and not zh_term:
-                        single_term = term.get('term', '')
                         term_language = self._detect_term_language(single_term)
                         
                         # 创建单一语言组
-                        lang_grp = ET.SubElement(term_entry, "langGrp", attrib={"xml:lang": term_language})
+                        lang_grp = ET.SubElement(term_entry, "langGrp", attrib={_XML_LANG: term_language})
                         term_grp = ET.SubElement(lang_grp, "termGrp")
                         term_elem = ET.SubElement(term_grp, "term")
                         term_elem.text = single_term
+                        last_term_grp = term_grp
                     else:
                         # 双语格式：创建英文语言组
                         if eng_term:
-                            lang_grp_en = ET.SubElement(term_entry, "langGrp", attrib={"xml:lang": "en"})
+                            lang_grp_en = ET.SubElement(term_entry, "langGrp", attrib={_XML_LANG: "en"})
                             term_grp_en = ET.SubElement(lang_grp_en, "termGrp")
                             term_elem_en = ET.SubElement(term_grp_en, "term")
                             term_elem_en.text = eng_term
+                            last_term_grp = term_grp_en
                         
                         # 双语格式：创建中文语言组
                         if zh_term:
-                            lang_grp_zh = ET.SubElement(term_entry, "langGrp", attrib={"xml:lang": "zh"})
+                            lang_grp_zh = ET.SubElement(term_entry, "langGrp", attrib={_XML_LANG: "zh"})
                             term_grp_zh = ET.SubElement(lang_grp_zh, "termGrp")
                             term_elem_zh = ET.SubElement(term_grp_zh, "term")
                             term_elem_zh.text = zh_term
+                            last_term_grp = term_grp_zh
                     
                     # 添加提取时间（在最后一个termGrp中）
-                    if result.get('created'):
-                        # 获取最后创建的termGrp
-                        last_lang_grp = list(term_entry.findall("langGrp"))[-1] if term_entry.findall("langGrp") else None
-                        if last_lang_grp is not None:
-                            last_term_grp = last_lang_grp.find("termGrp")
-                            if last_term_grp is not None:
-                                date_admin = ET.SubElement(last_term_grp, "admin", attrib={"type": "created"})
-                                date_admin.text = datetime.fromtimestamp(result['created']).strftime("%Y-%m-%d")
-        
-        # 格式化XML并保存
-        rough_string = ET.tostring(root, encoding='unicode')
-        reparsed = minidom.parseString(rough_string)
-        pretty_xml = reparsed.toprettyxml(indent="  ", encoding=None)
-        
-        # 移除空行
-        pretty_lines = [line for line in pretty_xml.split('\n') if line.strip()]
-        final_xml = '\n'.join(pretty_lines)
-        
-        # 添加XML声明和DOCTYPE
-        xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        doctype = '<!DOCTYPE tbx SYSTEM "TBXcoreStructV02.dtd">\n'
-        final_content = xml_declaration + doctype + '\n'.join(final_xml.split('\n')[1:])
+                    if created_date and last_term_grp is not None:
+                        date_admin = ET.SubElement(last_term_grp, "admin", attrib={"type": "created"})
+                        date_admin.text = created_date
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(final_content)
+        # 智能检测主要语言
+        root.set(_XML_LANG, primary_language or self._primary_language_from_counts(chinese_count, english_count))
+        
+        # 写入预编码的XML声明和DOCTYPE，再直接序列化元素树到文件
+        with open(output_file, 'wb') as f:
+            f.write(_TBX_PROLOG)
+            if LXML_AVAILABLE:
+                ET.ElementTree(root).write(f, encoding='utf-8', xml_declaration=False, pretty_print=True)
+            else:
+                # 原地缩进格式化XML（Python 3.9+ 提供ET.indent）
+                if hasattr(ET, "indent"):
+                    ET.indent(root, space="  ")
+                else:
+                    _indent_xml(root, space="  ")
+                ET.ElementTree(root).write(f, encoding='utf-8', xml_declaration=False)
         
-        self.logger.info(f"TBX结果已保存到: {output_file}")
+        self.logger.info("TBX结果已保存到: %s", output_file)
         return str(output_file)
     
     def _detect_primary_language(self, results: List[Dict[str, Any]]) -> str:
         """检测术语的主要语言"""
-        import re
+        
+        term_lists = [
+            result["extracted_terms"]["terms"] for result in results
+            if isinstance(result.get("extracted_terms", {}).get("terms"), list)
+        ]
         
         chinese_count = 0
         english_count = 0
-        total_terms = 0
+        # 术语总数作为未统计术语数量的上界，领先优势超过该数量时结果已确定
+        remaining = sum(len(terms) for terms in term_lists)
+        
+        for terms in term_lists:
+            for term in terms:
+                remaining -= 1
+                term_text = term.get('term', '')
+                if term_text:
+                    # 优先检测中文，如果包含中文字符就算中文术语
+                    if not term_text.isascii() and _CJK_RE.search(term_text):  # 包含中文字符
+                        chinese_count += 1
+                    # 只有纯英文才算英文术语
+                    elif _PURE_EN_RE.search(term_text):  # 纯英文字符
+                        english_count += 1
+                
+                decided = self._decided_primary_language(chinese_count, english_count, remaining)
+                if decided:
+                    return decided
         
-        for result in results:
-            terms = result.get("extracted_terms", {})
-            if "terms" in terms and isinstance(terms["terms"], list):
-                for term in terms["terms"]:
-                    term_text = term.get('term', '')
-                    if term_text:
-                        total_terms += 1
-                        # 优先检测中文，如果包含中文字符就算中文术语
-                        if re.search(r'[\u4e00-\u9fff]', term_text):  # 包含中文字符
-                            chinese_count += 1
-                        # 只有纯英文才算英文术语
-                        elif re.search(r'^[a-zA-Z0-9\s\-\(\)\.]+$', term_text):  # 纯英文字符
-                            english_count += 1
-        
-        # 根据主要语言返回语言代码
+        return self._primary_language_from_counts(chinese_count, english_count)
+    
+    def _decided_primary_language(self, chinese_count: int, english_count: int,
+                                  remaining: int) -> Optional[str]:
+        """剩余术语无论如何分布都不会改变结果时返回主要语言，否则返回None"""
+        if chinese_count > english_count + remaining:
+            return "zh-CN"
+        if english_count > 0 and english_count >= chinese_count + remaining:
+            return "en"
+        if remaining == 0:
+            return self._primary_language_from_counts(chinese_count, english_count)
+        return None
+    
+    def _primary_language_from_counts(self, chinese_count: int, english_count: int) -> str:
+        """根据中英文术语数量返回主要语言代码"""
         if chinese_count > english_count:
             return "zh-CN"
         elif english_count > 0:
@@ -1068,16 +1563,15 @@ class GPTProcessor:
     
     def _detect_term_language(self, term_text: str) -> str:
         """检测单个术语的语言"""
-        import re
         
         if not term_text:
             return "zh-CN"
         
         # 检查是否包含中文字符
-        if re.search(r'[\u4e00-\u9fff]', term_text):
+        if not term_text.isascii() and _CJK_RE.search(term_text):
             return "zh-CN"
         # 检查是否主要是英文字符
-        elif re.search(r'[a-zA-Z]', term_text):
+        elif _LATIN_RE.search(term_text):
             return "en"
         else:
             return "zh-CN"  # 默认中文
@@ -1089,7 +1583,8 @@ class GPTProcessor:
     def create_processing_checkpoint(self, 
                                    texts: List[str],
                                    source_files: List[str],
-                                   processing_config: Dict[str, Any]) -> Optional[str]:
+                                   processing_config: Dict[str, Any],
+                                   input_fingerprint: Optional[str] = None) -> Optional[str]:
         """
         创建处理断点
         
@@ -1097,6 +1592,7 @@ class GPTProcessor:
             texts: 文本列表
             source_files: 源文件列表
             processing_config: 处理配置
+            input_fingerprint: 输入文件集合的指纹
             
         Returns:
             str: 断点ID，如果未启用断点则返回None
@@ -1105,25 +1601,55 @@ class GPTProcessor:
             return None
         
         try:
-            # 创建虚拟文件列表（基于文本内容）
-            virtual_files = []
-            for i, text in enumerate(texts):
-                source_file = source_files[i] if i < len(source_files) else f"text_{i+1}.txt"
-                virtual_files.append(f"virtual_text_{i}_{source_file}")
+            # 创建虚拟文件列表，并记录每段文本的内容哈希
+            virtual_files = self._build_virtual_files(texts, source_files)
+            text_hashes = self._hash_texts(texts)
+            
+            # 已加载的断点对应相同文本和配置时直接复用，已完成的文本不再重复请求
+            if self.checkpoint_manager.matches_checkpoint(virtual_files, processing_config, text_hashes):
+                checkpoint_id = self.checkpoint_manager.current_checkpoint.checkpoint_id
+                self.logger.info("复用处理断点: %s", checkpoint_id)
+                return checkpoint_id
             
             checkpoint_id = self.checkpoint_manager.create_checkpoint(
                 files=virtual_files,
                 processing_config=processing_config,
-                output_directory=str(self.base_dir)
+                output_directory=str(self.base_dir),
+                input_fingerprint=input_fingerprint,
+                file_hashes=text_hashes
             )
             
-            self.logger.info(f"创建处理断点: {checkpoint_id}")
+            self.logger.info("创建处理断点: %s", checkpoint_id)
             return checkpoint_id
             
         except Exception as e:
-            self.logger.error(f"创建断点失败: {e}")
+            self.logger.error("创建断点失败: %s", e)
             return None
     
+    def _build_virtual_files(self, texts: List[str], source_files: List[str]) -> List[str]:
+        """构建文本对应的虚拟文件列表（用于断点记录）"""
+        text_count = len(texts)
+        source_count = len(source_files)
+        
+        # 来源文件与文本一一对应时无需逐个判断下标
+        if source_count >= text_count:
+            return [f"virtual_text_{i}_{source_files[i]}" for i in range(text_count)]
+        
+        return [
+            f"virtual_text_{i}_{source_files[i] if i < source_count else f'text_{i+1}.txt'}"
+            for i in range(text_count)
+        ]
+    
+    @staticmethod
+    def _hash_texts(texts: List[str]) -> List[str]:
+        """计算每段文本的内容哈希，断点只在文本内容完全一致时复用"""
+        return [hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest() for text in texts]
+    
+    def _hash_prompts(self, system_prompt: Optional[str], user_prompt_template: Optional[str]) -> str:
+        """计算提示词哈希，用于区分不同提示词（如单语/双语模式）下的断点"""
+        content = f"{system_prompt or ''}\n{user_prompt_template or ''}".encode('utf-8')
+        return hashlib.md5(content).hexdigest()[:8]
+    
     def update_text_processing_status(self, 
                                     text_index: int,
                                     source_file: str,
@@ -1152,7 +1678,7 @@ class GPTProcessor:
                 error_message=error_message
             )
         except Exception as e:
-            self.logger.warning(f"更新断点状态失败: {e}")
+            self.logger.warning("更新断点状态失败: %s", e)
     
     def list_available_checkpoints(self) -> List[Dict[str, Any]]:
         """列出可用的断点"""
@@ -1188,7 +1714,9 @@ class GPTProcessor:
                             max_tokens: int = 4096,
                             max_concurrent: int = 10,
                             description: str = "术语抽取批处理任务",
-                            source_files: List[str] = None) -> Dict[str, Any]:
+                            source_files: List[str] = None,
+                            use_batch_api: bool = False,
+                            input_fingerprint: Optional[str] = None) -> Dict[str, Any]:
         """
         只运行抽取流程，不保存最终结果文件
         
@@ -1202,6 +1730,8 @@ class GPTProcessor:
             max_concurrent: 最大并发数
             description: 任务描述
             source_files: 来源文件名列表
+            use_batch_api: 是否通过OpenAI Batch API提交（半价，最长24小时返回）
+            input_fingerprint: 输入文件集合的指纹，记录到断点中用于自动续传
             
         Returns:
             Dict[str, Any]: 包含处理结果的字典
@@ -1214,21 +1744,30 @@ class GPTProcessor:
             "temperature": temperature,
             "max_tokens": max_tokens,
             "max_concurrent": max_concurrent,
-            "description": description
+            "description": description,
+            "prompt_hash": self._hash_prompts(system_prompt, user_prompt_template)
         }
         
         checkpoint_id = self.create_processing_checkpoint(
             texts=texts,
             source_files=source_files or [],
-            processing_config=processing_config
+            processing_config=processing_config,
+            input_fingerprint=input_fingerprint
         )
         
         try:
-            # 步骤1: 并发处理所有文本
-            results = self._run_concurrent_processing(
-                texts, system_prompt, user_prompt_template, model, 
-                temperature, max_tokens, max_concurrent, source_files
-            )
+            # 步骤1: 处理所有文本（并发实时请求或Batch API）
+            if use_batch_api:
+                self.logger.info("🔄 步骤1: 通过Batch API处理文本")
+                results = self.process_batch_api(
+                    texts, system_prompt, user_prompt_template, model,
+                    temperature, max_tokens, source_files
+                )
+            else:
+                results = self._run_concurrent_processing(
+                    texts, system_prompt, user_prompt_template, model, 
+                    temperature, max_tokens, max_concurrent, source_files
+                )
             
             # 步骤2: 保存原始结果
             raw_file = self._save_raw_results(results)
@@ -1243,7 +1782,7 @@ class GPTProcessor:
             }
             
         except Exception as e:
-            self.logger.error(f"❌ 抽取流程执行失败: {e}")
+            self.logger.error("❌ 抽取流程执行失败: %s", e)
             raise
 
     def run_complete_pipeline(self, 
@@ -1284,7 +1823,8 @@ class GPTProcessor:
             "max_tokens": max_tokens,
             "max_concurrent": max_concurrent,
             "description": description,
-            "output_format": output_format
+            "output_format": output_format,
+            "prompt_hash": self._hash_prompts(system_prompt, user_prompt_template)
         }
         
         checkpoint_id = self.create_processing_checkpoint(
@@ -1326,7 +1866,7 @@ class GPTProcessor:
             }
             
         except Exception as e:
-            self.logger.error(f"❌ 完整流程执行失败: {e}")
+            self.logger.error("❌ 完整流程执行失败: %s", e)
             raise
     
     def _run_concurrent_processing(self, texts: List[str], system_prompt: str, 
@@ -1350,10 +1890,16 @@ class GPTProcessor:
         """保存原始结果"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         raw_result_file = self.base_dir / f"raw_results_{timestamp}.json"
-        with open(raw_result_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        if ORJSON_AVAILABLE:
+            # orjson的缩进输出同样在C中完成，直接写入UTF-8字节
+            with open(raw_result_file, 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            # 原始结果供程序读取，不缩进以使用json的C加速编码
+            with open(raw_result_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(results, ensure_ascii=False))
         
-        self.logger.info(f"原始结果已保存到: {raw_result_file}")
+        self.logger.info("原始结果已保存到: %s", raw_result_file)
         return str(raw_result_file)
     
     def _run_deduplication(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -1362,12 +1908,33 @@ class GPTProcessor:
         return self.deduplicate_terms(results)
 
 
+# =============================================================================
+# XML工具函数
+# =============================================================================
+
+def _indent_xml(elem, space: str = "  ", level: int = 0):
+    """为元素树添加缩进（Python 3.8 下ET.indent的替代实现）"""
+    if len(elem):
+        child_indent = "\n" + space * (level + 1)
+        if not elem.text or not elem.text.strip():
+            elem.text = child_indent
+        
+        for child in elem:
+            _indent_xml(child, space, level + 1)
+            if not child.tail or not child.tail.strip():
+                child.tail = child_indent
+        
+        # 最后一个子元素之后回退到当前层级
+        if not child.tail.strip():
+            child.tail = "\n" + space * level
+
+
 # =============================================================================
 # 文本加载和处理工具函数
 # =============================================================================
 
-def _save_intermediate_text(file_path: str, text: str):
-    """保存中间提取的文本文件"""
+def _save_intermediate_text(file_path: str, texts: List[str]):
+    """保存中间提取的文本文件（各页之间以空行分隔）"""
     import os
     from pathlib import Path
     
@@ -1380,20 +1947,93 @@ def _save_intermediate_text(file_path: str, text: str):
     output_file = extracted_dir / f"{source_file.stem}.txt"
     
     try:
-        # 保存提取的文本
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(text)
+        # 以二进制方式逐页写入UTF-8字节，不拼接完整文档
+        with open(output_file, 'wb') as f:
+            for i, text in enumerate(texts):
+                if i > 0:
+                    f.write(b'\n\n')
+                f.write(text.encode('utf-8'))
         
         print(f"💾 中间文本已保存: {output_file}")
         
     except Exception as e:
         print(f"⚠️  保存中间文本失败: {e}")
 
+def iter_paragraphs(file_path: str, encoding: str = 'utf-8', block_size: int = 1 << 20) -> Iterator[str]:
+    """
+    按块读取文本文件，在空行处切开后逐段产出
+    
+    产出的各段用'\n\n'重新连接后与文件完整内容一致，
+    可直接交给TextSplitter.split_stream，读取和分割交替进行，不缓存完整文件
+    
+    UTF-8文件通过内存映射读取，只解码当前块，不保留完整的字节副本；
+    其他编码、空文件或包含'\r'（需要换行符转换）的文件按文本模式分块读取
+    
+    Args:
+        file_path: 文件路径
+        encoding: 文件编码
+        block_size: 每次产出的最大字节数（文本模式下为字符数）
+    """
+    if encoding.replace('-', '').lower() == 'utf8':
+        with open(file_path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射
+                mm = None
+            
+            if mm is not None:
+                with mm:
+                    if mm.find(b'\r') == -1:
+                        yield from _iter_mapped_paragraphs(mm, block_size)
+                        return
+    
+    remainder = ""
+    with open(file_path, 'r', encoding=encoding, buffering=block_size) as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            
+            remainder += block
+            cut = remainder.rfind('\n\n')
+            if cut != -1:
+                yield remainder[:cut]
+                remainder = remainder[cut + 2:]
+    
+    yield remainder
+
+
+def _iter_mapped_paragraphs(mm: "mmap.mmap", block_size: int) -> Iterator[str]:
+    """
+    从内存映射的UTF-8内容中逐块产出段落
+    
+    '\n'字节不会出现在多字节UTF-8字符内部，在b'\n\n'处切开的每一块都能独立解码
+    """
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    
+    size = len(mm)
+    pos = 0
+    while pos < size:
+        end = min(pos + block_size, size)
+        cut = mm.rfind(b'\n\n', pos, end) if end < size else -1
+        if cut == -1 and end < size:
+            # 块内没有空行时向后查找下一个空行
+            cut = mm.find(b'\n\n', end - 1)
+        if cut == -1:
+            break
+        yield mm[pos:cut].decode('utf-8')
+        pos = cut + 2
+    
+    yield mm[pos:].decode('utf-8')
+
 def load_texts_from_file(file_path: str, 
                         chunk_size: Optional[int] = None,
                         use_smart_splitter: bool = True,
                         overlap_size: int = 200,
-                        enable_ocr: bool = True) -> List[str]:
+                        enable_ocr: bool = True,
+                        save_intermediate: bool = False) -> List[str]:
     """
     从文件加载文本并进行智能分割
     
@@ -1403,36 +2043,48 @@ def load_texts_from_file(file_path: str,
         use_smart_splitter: 是否使用智能分割器
         overlap_size: 重叠大小（字符数）
         enable_ocr: 是否启用OCR功能（用于扫描版PDF和图片）
+        save_intermediate: 是否将提取的文本保存到extracted_texts文件夹
         
     Returns:
         分割后的文本列表
     """
     from file_processor import FileProcessor
     from text_splitter import TextSplitter
+    from config import TEXT_SPLITTING
     import os
     
     # 加载文件内容
     processor = FileProcessor(enable_ocr=enable_ocr)
     
+    # 扩展名不区分大小写（文件扫描同样不区分）
+    suffix = Path(file_path).suffix.lower()
+    
+    # 纯文本文件使用智能分割且无需保存中间文本时，边读取边分割
+    stream_text_file = (
+        chunk_size and use_smart_splitter and not save_intermediate
+        and suffix not in ('.pdf', '.docx', '.doc')
+    )
+    
     try:
-        if file_path.endswith('.pdf'):
+        if suffix == '.pdf':
             texts = processor.extract_pdf_text(file_path)
-        elif file_path.endswith(('.docx', '.doc')):
+        elif suffix in ('.docx', '.doc'):
             texts = processor.extract_docx_text(file_path)
+        elif stream_text_file:
+            # 文本文件按段落流式读取，内容是否为空在分割后检查
+            texts = iter_paragraphs(file_path)
         else:
             # 文本文件
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             texts = [content]
         
-        if not texts or not any(text.strip() for text in texts):
+        if not stream_text_file and (not texts or not any(text.strip() for text in texts)):
             raise ValueError("文件内容为空或无法提取")
         
-        # 合并所有文本
-        full_text = '\n\n'.join(texts)
-        
-        # 保存中间文本文件到extracted_texts文件夹
-        _save_intermediate_text(file_path, full_text)
+        # 保存中间文本文件到extracted_texts文件夹（后台线程写入，与分割并行）
+        if save_intermediate:
+            threading.Thread(target=_save_intermediate_text, args=(file_path, texts)).start()
         
         # 根据配置进行分割
         if chunk_size and use_smart_splitter:
@@ -1442,10 +2094,19 @@ def load_texts_from_file(file_path: str,
             
             splitter = TextSplitter(
                 max_tokens=max_tokens,
-                overlap_tokens=overlap_tokens
+                overlap_tokens=overlap_tokens,
+                prefix_overlap_only=TEXT_SPLITTING.get("prefix_overlap_only", True)
             )
-            return splitter.split_text_with_metadata(full_text, Path(file_path).name)
-        elif chunk_size:
+            # 逐页流式分割，不拼接完整文档
+            chunks = splitter.split_stream(texts, Path(file_path).name)
+            if not chunks:
+                raise ValueError("文件内容为空或无法提取")
+            return chunks
+        
+        # 合并所有文本
+        full_text = '\n\n'.join(texts)
+        
+        if chunk_size:
             # 简单按段落分割
             splitter = TextSplitter(max_tokens=10000)  # 设置很大的值，避免合并
             chunks = splitter.split_by_paragraphs(full_text)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存
+以请求参数的哈希为键，将模型响应保存到SQLite文件中，
+重复运行相同文档或分块重叠产生相同请求时直接返回缓存结果，不再调用API
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# 可选：orjson提供更快的JSON序列化
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(api_params: Dict[str, Any]) -> Optional[str]:
+    """
+    计算请求的缓存键
+
+    只有temperature为0的请求输出是确定的，其余请求不缓存
+
+    Args:
+        api_params: API调用参数（模型、消息、温度、最大输出token数）
+
+    Returns:
+        Optional[str]: sha256十六进制摘要，请求不可缓存时返回None
+    """
+    if api_params.get("temperature") != 0:
+        return None
+
+    content = json.dumps(api_params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """基于SQLite的LLM响应缓存"""
+
+    def __init__(self, cache_file: str = ".cache/llm_cache.sqlite"):
+        """
+        初始化响应缓存
+
+        Args:
+            cache_file: SQLite缓存文件路径
+        """
+        self.cache_file = Path(cache_file)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # 工作线程共享同一连接，读写由锁串行化
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_file), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, ts INTEGER NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的响应
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[Dict[str, Any]]: 缓存的响应，未命中时返回None
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("读取响应缓存失败: %s", e)
+            return None
+
+        if not row:
+            return None
+        return orjson.loads(row[0]) if ORJSON_AVAILABLE else json.loads(row[0])
+
+    def set(self, key: str, response: Dict[str, Any]):
+        """
+        写入响应缓存
+
+        Args:
+            key: 缓存键
+            response: 要缓存的响应
+        """
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps(response).decode('utf-8')
+        else:
+            data = json.dumps(response, ensure_ascii=False)
+        
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, ts) VALUES (?, ?, ?)",
+                    (key, data, int(time.time()))
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("写入响应缓存失败: %s", e)
+
+    def close(self):
+        """关闭缓存连接"""
+        with self._lock:
+            self._conn.close()
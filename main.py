@@ -5,24 +5,73 @@ OpenAI GPT批处理术语抽取 - 主程序
 提供简单的命令行界面和快速配置选项
 """
 
+import io
 import os
+import re
 import sys
 import argparse
+import threading
 from pathlib import Path
-from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
 
-# 导入我们的模块
+# 导入我们的模块（gpt_processor依赖openai和tiktoken，首次使用时再导入，
+# 使 --help 等不调用API的命令无需加载这些库）
 try:
-    from gpt_processor import GPTProcessor, load_texts_from_file
+    from checkpoint_manager import compute_input_fingerprint
     from config import (
-        OPENAI_API_KEY, OPENAI_BASE_URL, BATCH_CONFIG,
-        SYSTEM_PROMPT, get_user_prompt, TEXT_SPLITTING
+        OPENAI_API_KEY, OPENAI_BASE_URL, BATCH_CONFIG, CACHE_CONFIG,
+        SYSTEM_PROMPT, get_user_prompt, TEXT_SPLITTING, FILE_PROCESSING
     )
 except ImportError as e:
     print(f"❌ 导入模块失败: {e}")
     print("请确保所有必要的文件都在当前目录中")
     sys.exit(1)
 
+# 支持处理的文件扩展名
+_SUPPORTED_EXTENSIONS = {".txt", ".pdf", ".docx", ".doc", ".md", ".csv"}
+
+# 文件大小单位，下标为以1024为底的指数
+_SIZE_UNITS = ("bytes", "KB", "MB")
+
+# 文本开头的文件标识（内容非空），分组只保留文件名（不含" - 第N部分"）
+_FILE_TAG_RE = re.compile(r'\[文件: (?=[^\]])([^\]]*?)(?: - 第\d+部分)?\]')
+
+
+class SplitConfig(NamedTuple):
+    """文本分割配置（可按 chunk_size, use_smart_splitter, overlap_size 解包）"""
+    chunk_size: Optional[int]
+    use_smart_splitter: bool
+    overlap_size: int
+
+
+class _ThreadBufferedStdout:
+    """
+    并行加载文件期间替换sys.stdout
+
+    调用了capture()的工作线程的输出写入各自的缓冲区，由主线程连同文件标题一起按顺序打印；
+    其他线程照常直接输出
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def capture(self) -> io.StringIO:
+        """开始缓存当前线程的输出"""
+        self._local.buffer = io.StringIO()
+        return self._local.buffer
+
+    def release(self):
+        """停止缓存当前线程的输出"""
+        self._local.buffer = None
+
+    def write(self, text: str) -> int:
+        return (getattr(self._local, "buffer", None) or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
 
 class TermExtractionApp:
     """术语抽取应用类"""
@@ -32,6 +81,10 @@ class TermExtractionApp:
         self.processor = None
         self.enable_ocr = True  # 默认启用OCR
         self.use_gpu = False    # 默认不使用GPU
+        self._file_sizes = {}   # 扫描目录时记录的文件大小 {Path: bytes}
+        self._input_fingerprint = None  # 处理整个file preparation文件夹时的输入指纹
+        self.max_rpm = BATCH_CONFIG.get("max_rpm")  # 每分钟最大请求数
+        self.max_tpm = BATCH_CONFIG.get("max_tpm")  # 每分钟最大token数
         
     # =============================================================================
     # API密钥管理
@@ -205,15 +258,24 @@ class TermExtractionApp:
     
     def _scan_preparation_folder(self) -> List[Path]:
         """扫描file preparation文件夹"""
-        prep_dir = Path("file preparation")
-        supported_extensions = ["*.txt", "*.pdf", "*.docx", "*.doc", "*.md", "*.csv"]
-        
-        prep_files = []
-        if prep_dir.exists():
-            for ext in supported_extensions:
-                prep_files.extend(prep_dir.glob(ext))
+        return self._scan_directory("file preparation")
+    
+    def _scan_directory(self, directory: str) -> List[Path]:
+        """一次遍历目录，返回支持格式的文件（扩展名不区分大小写）"""
+        supported_files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if (os.path.splitext(entry.name)[1].lower() in _SUPPORTED_EXTENSIONS
+                            and entry.is_file()):
+                        file_path = Path(entry.path)
+                        supported_files.append(file_path)
+                        # DirEntry会缓存stat结果，后续显示列表时不再单独调用stat
+                        self._file_sizes[file_path] = entry.stat().st_size
+        except (FileNotFoundError, NotADirectoryError):
+            pass
         
-        return prep_files
+        return supported_files
     
     def _handle_preparation_files(self, prep_files: List[Path]) -> List[str]:
         """处理preparation文件夹中的文件"""
@@ -228,6 +290,8 @@ class TermExtractionApp:
             choice = input("选择处理方式 (1-3): ").strip()
             
             if choice == "1":
+                # 记录输入指纹，下次运行时据此自动续传或清理断点
+                self._input_fingerprint = compute_input_fingerprint(prep_files)
                 return self._process_multiple_files(prep_files)
             elif choice == "2":
                 return self._select_single_file(prep_files)
@@ -242,7 +306,7 @@ class TermExtractionApp:
         total_size = 0
         
         for i, file in enumerate(files, 1):
-            file_size = file.stat().st_size
+            file_size = self._get_file_size(file)
             total_size += file_size
             size_str = self._format_file_size(file_size)
             file_type = file.suffix.upper()
@@ -251,45 +315,89 @@ class TermExtractionApp:
         total_size_str = self._format_file_size(total_size)
         print(f"\n📊 总计: {len(files)} 个文件，{total_size_str}")
     
-    def _format_file_size(self, size: int) -> str:
+    def _get_file_size(self, file: Path) -> int:
+        """获取文件大小，优先使用扫描目录时记录的结果"""
+        file_size = self._file_sizes.get(file)
+        if file_size is None:
+            file_size = self._file_sizes[file] = file.stat().st_size
+        return file_size
+    
+    @staticmethod
+    def _format_file_size(size: int) -> str:
         """格式化文件大小"""
-        if size < 1024:
+        # bit_length()-1即floor(log2(size))，每10位升一级单位，MB以上仍按MB显示
+        unit_index = min(max(size.bit_length() - 1, 0) // 10, 2)
+        if not unit_index:
             return f"({size} bytes)"
-        elif size < 1024 * 1024:
-            return f"({size/1024:.1f} KB)"
-        else:
-            return f"({size/(1024*1024):.1f} MB)"
+        return f"({size / (1 << (10 * unit_index)):.1f} {_SIZE_UNITS[unit_index]})"
     
-    def _process_multiple_files(self, files: List[Path]) -> List[str]:
-        """处理多个文件"""
+    def _process_multiple_files(self, files: List[Path],
+                                split_config: Optional[SplitConfig] = None) -> List[str]:
+        """处理多个文件（未指定分割配置时交互式获取）"""
         all_texts = []
         
         # 获取分割配置
-        chunk_size, use_smart_splitter, overlap_size = self._get_splitting_config()
+        chunk_size, use_smart_splitter, overlap_size = split_config or self._get_splitting_config()
         
-        print(f"\n🔄 开始处理 {len(files)} 个文件...")
+        # 提前通知内核预读所有文件，后续解析时直接命中页缓存
+        self._prefetch_files(files)
         
-        for i, file_path in enumerate(files, 1):
-            try:
-                print(f"\n📄 处理文件 {i}/{len(files)}: {file_path.name}")
-                texts = self._process_single_file_content(
-                    file_path, chunk_size, use_smart_splitter, overlap_size
-                )
-                all_texts.extend(texts)
-                print(f"  ✅ 成功提取 {len(texts)} 个文本块")
+        # 各文件的读取、OCR和分割相互独立，使用线程池并行处理
+        max_workers = max(1, min(FILE_PROCESSING.get("max_load_workers", 4), len(files)))
+        print(f"\n🔄 开始处理 {len(files)} 个文件（并行 {max_workers} 个）...")
+        
+        # 工作线程的输出先缓存，避免多个文件的进度信息交错
+        output = _ThreadBufferedStdout(sys.stdout)
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self._load_file_buffered, output,
+                        file_path, chunk_size, use_smart_splitter, overlap_size
+                    )
+                    for file_path in files
+                ]
                 
-            except Exception as e:
-                print(f"  ❌ 处理文件 {file_path.name} 失败: {e}")
-                continue
+                # 按文件顺序收集结果，文本块顺序与逐个处理时一致
+                for i, (file_path, future) in enumerate(zip(files, futures), 1):
+                    texts, log, error = future.result()
+                    print(f"\n📄 文件 {i}/{len(files)}: {file_path.name}")
+                    print(log, end="")
+                    
+                    if error is not None:
+                        print(f"  ❌ 处理文件 {file_path.name} 失败: {error}")
+                        continue
+                    
+                    all_texts.extend(texts)
+                    print(f"  ✅ 成功提取 {len(texts)} 个文本块")
+        finally:
+            sys.stdout = output.stream
         
         print(f"\n✅ 批量处理完成！总共获得 {len(all_texts)} 个文本块")
         return all_texts
     
+    def _prefetch_files(self, files: List[Path]):
+        """通过posix_fadvise(WILLNEED)异步预读文件内容（仅支持的平台）"""
+        if not hasattr(os, "posix_fadvise"):
+            return
+        
+        for file_path in files:
+            try:
+                fd = os.open(file_path, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+            except OSError:
+                # 预读只是优化，失败时由后续正常读取报告错误
+                continue
+    
     def _select_single_file(self, files: List[Path]) -> List[str]:
         """选择单个文件处理"""
         print("\n📋 请选择要处理的文件:")
         for i, file in enumerate(files, 1):
-            file_size = file.stat().st_size
+            file_size = self._get_file_size(file)
             size_str = self._format_file_size(file_size)
             print(f"{i}. {file.name} {size_str}")
         
@@ -332,22 +440,13 @@ class TermExtractionApp:
     
     def _scan_other_locations(self) -> List[Path]:
         """扫描其他位置的文件"""
-        supported_files = []
-        supported_extensions = ["*.txt", "*.pdf", "*.docx", "*.doc", "*.md", "*.csv"]
-        
         # 检查extracted_texts目录
-        extracted_dir = Path("extracted_texts")
-        if extracted_dir.exists():
-            for ext in supported_extensions:
-                supported_files.extend(extracted_dir.glob(ext))
-        
-        # 检查当前目录的支持文件
-        for ext in supported_extensions:
-            current_files = list(Path(".").glob(ext))
-            # 排除file preparation文件夹中的文件
-            for file in current_files:
-                if not str(file).startswith("file preparation"):
-                    supported_files.append(file)
+        supported_files = self._scan_directory("extracted_texts")
+        
+        # 检查当前目录的支持文件（排除file preparation文件夹中的文件）
+        for file in self._scan_directory("."):
+            if not file.name.startswith("file preparation"):
+                supported_files.append(file)
         
         return supported_files
     
@@ -355,7 +454,7 @@ class TermExtractionApp:
     # 文本分割配置
     # =============================================================================
     
-    def _get_splitting_config(self) -> Tuple[Optional[int], bool, int]:
+    def _get_splitting_config(self) -> SplitConfig:
         """获取文本分割配置"""
         print("\n📝 文本分割配置:")
         print("1. 智能分割 (推荐) - 按段落和语义边界分割")
@@ -373,14 +472,15 @@ class TermExtractionApp:
         elif choice == "2":
             return self._get_whole_document_config()
         else:
-            return None, False, 0  # 按段落处理
+            return SplitConfig(None, False, 0)  # 按段落处理
     
-    def _get_smart_splitting_config(self) -> Tuple[int, bool, int]:
+    def _get_smart_splitting_config(self) -> SplitConfig:
         """获取智能分割配置"""
         default_chunk = TEXT_SPLITTING["default_chunk_size"]
         default_overlap = TEXT_SPLITTING["default_overlap_size"]
         min_chunk = TEXT_SPLITTING["min_chunk_size"]
         max_chunk = TEXT_SPLITTING["max_chunk_size"]
+        max_overlap_ratio = TEXT_SPLITTING["max_overlap_ratio"]
         
         # 获取块大小
         while True:
@@ -399,28 +499,28 @@ class TermExtractionApp:
             except ValueError:
                 print("❌ 请输入有效数字")
         
-        # 获取重叠大小
+        # 获取重叠大小（上限只取决于块大小，在循环外计算一次）
+        max_overlap = int(chunk_size * max_overlap_ratio)
         while True:
             try:
                 overlap_size = int(input(
                     f"请输入重叠大小 (字符数, 默认{default_overlap}): "
                 ) or str(default_overlap))
                 
-                max_overlap = int(chunk_size * TEXT_SPLITTING["max_overlap_ratio"])
                 if overlap_size >= chunk_size:
                     print("⚠️  重叠大小不能大于等于块大小")
                     continue
                 if overlap_size > max_overlap:
-                    ratio_percent = int(TEXT_SPLITTING['max_overlap_ratio'] * 100)
+                    ratio_percent = int(max_overlap_ratio * 100)
                     print(f"⚠️  重叠大小过大，不应超过块大小的{ratio_percent}% ({max_overlap}字符)")
                     continue
                 break
             except ValueError:
                 print("❌ 请输入有效数字")
         
-        return chunk_size, True, overlap_size
+        return SplitConfig(chunk_size, True, overlap_size)
     
-    def _get_whole_document_config(self) -> Tuple[int, bool, int]:
+    def _get_whole_document_config(self) -> SplitConfig:
         """获取整文档处理配置"""
         threshold = TEXT_SPLITTING.get("whole_document_threshold", 300000)
         print(f"\n🔄 整文档模式:")
@@ -428,7 +528,7 @@ class TermExtractionApp:
         print(f"   • 利用模型的128K总上下文")
         print(f"   • 预留28K tokens给提示词和输出")
         print(f"   • 一次性处理完整文档，减少信息丢失")
-        return threshold, True, 0  # 整文档模式，无重叠
+        return SplitConfig(threshold, True, 0)  # 整文档模式，无重叠
     
     # =============================================================================
     # 文件处理核心逻辑
@@ -441,6 +541,24 @@ class TermExtractionApp:
             file_path, chunk_size, use_smart_splitter, overlap_size
         )
     
+    def _load_file_buffered(self, output: _ThreadBufferedStdout, file_path: Path,
+                            chunk_size: Optional[int], use_smart_splitter: bool,
+                            overlap_size: int) -> Tuple[List[str], str, Optional[Exception]]:
+        """
+        在工作线程中处理单个文件，并缓存处理期间的输出
+        
+        Returns:
+            Tuple: (文本块列表, 处理期间的输出, 异常；成功时为None)
+        """
+        buffer = output.capture()
+        try:
+            texts = self._process_single_file_content(file_path, chunk_size, use_smart_splitter, overlap_size)
+            return texts, buffer.getvalue(), None
+        except Exception as e:
+            return [], buffer.getvalue(), e
+        finally:
+            output.release()
+    
     def _process_single_file_content(
         self, 
         file_path: Path, 
@@ -449,13 +567,16 @@ class TermExtractionApp:
         overlap_size: int
     ) -> List[str]:
         """处理单个文件内容"""
+        from gpt_processor import load_texts_from_file
+        
         try:
             texts = load_texts_from_file(
                 str(file_path), 
                 chunk_size=chunk_size,
                 use_smart_splitter=use_smart_splitter,
                 overlap_size=overlap_size,
-                enable_ocr=self.enable_ocr
+                enable_ocr=self.enable_ocr,
+                save_intermediate=FILE_PROCESSING.get("save_intermediate_text", False)
             )
             
             # 智能分割器已经在内部添加了文件标识，这里不需要重复添加
@@ -471,14 +592,10 @@ class TermExtractionApp:
     
     def _add_file_labels(self, texts: List[str], filename: str) -> List[str]:
         """为文本添加文件标签"""
-        file_texts = []
-        for j, text in enumerate(texts, 1):
-            if len(texts) > 1:
-                labeled_text = f"[文件: {filename} - 第{j}部分]\n{text}"
-            else:
-                labeled_text = f"[文件: {filename}]\n{text}"
-            file_texts.append(labeled_text)
-        return file_texts
+        # 只有一个文本时不编号，其余情况按部分编号
+        if len(texts) == 1:
+            return [f"[文件: {filename}]\n{texts[0]}"]
+        return [f"[文件: {filename} - 第{j}部分]\n{text}" for j, text in enumerate(texts, 1)]
     
     # =============================================================================
     # 输出配置
@@ -533,6 +650,48 @@ class TermExtractionApp:
             else:
                 print("❌ 无效选择，请输入1或2")
     
+    def generate_output_files(self, results: dict, source_files: List[str], model: str,
+                              output_formats: List[str]) -> List[str]:
+        """
+        不经交互直接生成指定格式的输出文件
+        
+        Args:
+            results: 处理结果
+            source_files: 源文件列表
+            model: 使用的模型
+            output_formats: 输出格式列表
+            
+        Returns:
+            List[str]: 生成的文件路径列表
+        """
+        if not results or not results.get('merged_results'):
+            print("❌ 没有可用的处理结果")
+            return []
+        
+        merged_results = results['merged_results']
+        generated_files = []
+        
+        source_filename = self.processor._extract_source_filename(source_files)
+        model_name = model.replace("-", "").replace(".", "")  # 清理模型名用于文件名
+        total_terms = self.processor._count_total_terms(merged_results)
+        print(f"\n🎉 术语抽取完成！共提取 {total_terms} 个术语")
+        
+        for output_format in output_formats:
+            try:
+                output_file = self.processor.save_processed_results(
+                    merged_results,
+                    output_format,
+                    source_filename,
+                    model_name,
+                    total_terms
+                )
+                generated_files.append(output_file)
+                print(f"✅ {output_format.upper()}文件已生成: {output_file}")
+            except Exception as e:
+                print(f"❌ 生成{output_format.upper()}文件失败: {e}")
+        
+        return generated_files
+    
     def handle_output_generation(self, results: dict, source_files: List[str], model: str) -> List[str]:
         """
         处理输出文件生成，支持重复选择不同格式
@@ -605,53 +764,41 @@ class TermExtractionApp:
     
     def _extract_source_files(self, texts: List[str]) -> List[str]:
         """从文本中提取来源文件名"""
-        import re
-        source_files = []
-        
-        for text in texts:
-            # 查找文本开头的文件标识
-            match = re.search(r'\[文件: ([^\]]+)\]', text)
-            if match:
-                filename = match.group(1)
-                # 移除部分标识，只保留文件名
-                filename = re.sub(r' - 第\d+部分$', '', filename)
-                source_files.append(filename)
-            else:
-                source_files.append("")
-        
-        return source_files
+        # 查找文本开头的文件标识，部分标识由正则直接排除在分组之外
+        return [match.group(1) if match else "" for match in map(_FILE_TAG_RE.search, texts)]
     
     def run_batch_processing(
         self, 
         texts: List[str], 
         model: str,
-        bilingual: bool = True
-    ) -> Optional[dict]:
-        """运行批处理（不包含输出格式，只进行抽取）"""
-        if not self.processor:
-            # 获取base_url配置
-            base_url = os.getenv("OPENAI_BASE_URL", OPENAI_BASE_URL)
-            self.processor = GPTProcessor(
-                api_key=self.api_key, 
-                base_url=base_url,
-                enable_checkpoint=True  # 启用断点功能
-            )
+        bilingual: bool = True,
+        use_batch_api: bool = False
+    ) -> Tuple[Optional[dict], List[str]]:
+        """
+        运行批处理（不包含输出格式，只进行抽取）
+        
+        Returns:
+            Tuple[Optional[dict], List[str]]: (处理结果，失败时为None; 各文本的来源文件名)
+        """
+        processor = self._get_processor()
         
         print(f"\n🚀 开始批处理任务")
         print(f"📝 文本数量: {len(texts)}")
         print(f"🤖 使用模型: {model}")
         print(f"🌐 提取模式: {'双语' if bilingual else '单语'}")
+        if use_batch_api:
+            print("📦 提交方式: OpenAI Batch API（最长24小时返回）")
         print("-" * 50)
         
+        # 提取来源文件信息（随结果一起返回，生成输出时不再重复提取）
+        source_files = self._extract_source_files(texts)
+        
         try:
-            # 提取来源文件信息
-            source_files = self._extract_source_files(texts)
-            
             # 获取用户提示词模板（传入bilingual参数）
             user_prompt_template = get_user_prompt("{text}", bilingual=bilingual)
             
             # 运行处理流程，但不保存最终结果
-            results = self.processor.run_extraction_only(
+            results = processor.run_extraction_only(
                 texts=texts,
                 system_prompt=SYSTEM_PROMPT,
                 user_prompt_template=user_prompt_template,
@@ -660,19 +807,92 @@ class TermExtractionApp:
                 max_tokens=BATCH_CONFIG["max_output_tokens"],
                 max_concurrent=BATCH_CONFIG["max_concurrent"],
                 description="军事航天术语抽取任务",
-                source_files=source_files
+                source_files=source_files,
+                use_batch_api=use_batch_api,
+                input_fingerprint=self._input_fingerprint
             )
             
-            return results
+            return results, source_files
             
         except Exception as e:
             print(f"❌ 批处理失败: {e}")
-            return None
+            return None, source_files
+    
+    def _create_processor(self) -> "GPTProcessor":
+        """创建GPT处理器（启用断点和响应缓存）"""
+        from gpt_processor import GPTProcessor
+        
+        # 获取base_url配置
+        base_url = os.getenv("OPENAI_BASE_URL", OPENAI_BASE_URL)
+        return GPTProcessor(
+            api_key=self.api_key, 
+            base_url=base_url,
+            enable_checkpoint=True,  # 启用断点功能
+            enable_cache=CACHE_CONFIG["enabled"],
+            cache_file=CACHE_CONFIG["cache_file"],
+            max_connections=BATCH_CONFIG["max_concurrent"],
+            max_rpm=self.max_rpm,
+            max_tpm=self.max_tpm
+        )
+    
+    def _get_processor(self) -> "GPTProcessor":
+        """获取GPT处理器，整个应用共用一个实例（及其HTTP连接池）"""
+        if not self.processor:
+            self.processor = self._create_processor()
+        return self.processor
     
     # =============================================================================
     # 断点续传功能
     # =============================================================================
     
+    def _resolve_checkpoints_by_fingerprint(self, fingerprint: Optional[str],
+                                            incomplete_checkpoints: Optional[List[dict]] = None) -> List[dict]:
+        """
+        根据输入指纹自动处理未完成的断点
+        
+        记录了指纹但与当前输入不一致的断点说明输入已变化，直接删除；
+        指纹一致的断点预先加载到处理器中，之后处理相同文本时跳过已完成的部分
+        
+        Args:
+            fingerprint: 当前file preparation文件夹的输入指纹，None表示无法计算（不删除、不加载任何断点）
+            incomplete_checkpoints: 未完成的断点列表，None时从断点目录读取
+            
+        Returns:
+            List[dict]: 未记录指纹、仍需用户选择的断点
+        """
+        from checkpoint_manager import CheckpointManager
+        checkpoint_manager = CheckpointManager()
+        if incomplete_checkpoints is None:
+            incomplete_checkpoints = [
+                cp for cp in checkpoint_manager.list_checkpoints() if not cp.get('is_completed', False)
+            ]
+        
+        unfingerprinted = [cp for cp in incomplete_checkpoints if not cp.get('input_fingerprint')]
+        
+        # 没有当前指纹时无法判断断点是否过期，全部保留
+        if not fingerprint:
+            return unfingerprinted
+        
+        stale = [
+            cp for cp in incomplete_checkpoints
+            if cp.get('input_fingerprint') and cp['input_fingerprint'] != fingerprint
+        ]
+        for cp in stale:
+            checkpoint_manager.delete_checkpoint(cp['checkpoint_id'])
+        if stale:
+            print(f"🗑️  输入文件已变化，已删除 {len(stale)} 个过期的断点")
+        
+        matching = next(
+            (cp for cp in incomplete_checkpoints if cp.get('input_fingerprint') == fingerprint),
+            None
+        )
+        if matching:
+            if self._get_processor().load_checkpoint_for_resume(matching['checkpoint_id']):
+                print(f"🔄 输入文件未变化，自动续传未完成的任务 (进度: {matching.get('progress', '0/0')})")
+                print("💡 选择与上次相同的处理方式即可跳过已完成的文本")
+        
+        return unfingerprinted
+    
     def check_and_handle_checkpoints(self) -> bool:
         """
         检查和处理断点续传
@@ -691,6 +911,14 @@ class TermExtractionApp:
             # 过滤未完成的断点
             incomplete_checkpoints = [cp for cp in checkpoints if not cp.get('is_completed', False)]
             
+            if not incomplete_checkpoints:
+                return False
+            
+            # 先按file preparation文件夹的输入指纹自动续传或清理，只有未记录指纹的断点需要询问
+            prep_files = self._scan_preparation_folder()
+            fingerprint = compute_input_fingerprint(prep_files) if prep_files else None
+            incomplete_checkpoints = self._resolve_checkpoints_by_fingerprint(fingerprint, incomplete_checkpoints)
+            
             if not incomplete_checkpoints:
                 return False
             
@@ -718,7 +946,6 @@ class TermExtractionApp:
                     if choice_num == len(incomplete_checkpoints) + 2:
                         # 删除所有checkpoint
                         print("🗑️  正在删除所有checkpoint...")
-                        import shutil
                         checkpoint_dir = Path("checkpoints")
                         if checkpoint_dir.exists():
                             for file in checkpoint_dir.glob("*.json"):
@@ -756,13 +983,8 @@ class TermExtractionApp:
         try:
             print(f"\n🔄 正在恢复断点: {checkpoint_id}")
             
-            # 初始化处理器（启用断点功能）
-            base_url = os.getenv("OPENAI_BASE_URL", OPENAI_BASE_URL)
-            processor = GPTProcessor(
-                api_key=self.api_key, 
-                base_url=base_url,
-                enable_checkpoint=True
-            )
+            # 复用应用的处理器（启用断点功能）
+            processor = self._get_processor()
             
             # 加载断点
             if not processor.load_checkpoint_for_resume(checkpoint_id):
@@ -780,12 +1002,21 @@ class TermExtractionApp:
             print("⚠️  断点恢复功能正在开发中...")
             print("💡 您可以选择跳过，开始新任务")
             
+            # 未恢复时卸载刚加载的断点，避免共享处理器上随后开始的新任务误用其中的结果
+            self._unload_checkpoint(processor)
             return False
             
         except Exception as e:
             print(f"❌ 恢复断点失败: {e}")
+            self._unload_checkpoint(self.processor)
             return False
     
+    @staticmethod
+    def _unload_checkpoint(processor):
+        """清除处理器上已加载的断点"""
+        if processor is not None and processor.checkpoint_manager:
+            processor.checkpoint_manager.current_checkpoint = None
+    
     # =============================================================================
     # 主程序流程
     # =============================================================================
@@ -822,11 +1053,10 @@ class TermExtractionApp:
         print(f"✅ 选择模型: {model}")
         
         # 7. 运行批处理（只进行抽取，不保存最终结果）
-        results = self.run_batch_processing(texts, model, bilingual)
+        results, source_files = self.run_batch_processing(texts, model, bilingual)
         
         if results:
             # 8. 抽取完成后，选择输出格式并支持重复选择
-            source_files = self._extract_source_files(texts)
             generated_files = self.handle_output_generation(results, source_files, model)
             
             if generated_files:
@@ -839,6 +1069,58 @@ class TermExtractionApp:
         else:
             print("❌ 批处理失败")
 
+    def run_headless(self, args) -> List[str]:
+        """
+        按命令行参数运行完整流程（加载文件、抽取、生成输出），不进行任何交互
+        
+        Args:
+            args: 命令行参数
+            
+        Returns:
+            List[str]: 生成的文件路径列表
+        """
+        from config import DEFAULT_MODEL
+        print("🤖 无交互模式运行")
+        
+        if not self.setup_api_key():
+            return []
+        
+        # 指定文件时只处理该文件，否则处理file preparation文件夹中的所有文件
+        files = [Path(args.file)] if args.file else self._scan_preparation_folder()
+        if not files:
+            print("❌ 没有找到要处理的文件")
+            return []
+        
+        if not args.file:
+            # 与交互模式相同：文件夹输入未变化时复用未完成的断点，输入已变化的断点自动清理
+            self._input_fingerprint = compute_input_fingerprint(files)
+            self._resolve_checkpoints_by_fingerprint(self._input_fingerprint)
+        
+        texts = self._process_multiple_files(files, self._split_config_from_args(args))
+        if not texts:
+            print("❌ 没有输入文本，程序退出")
+            return []
+        
+        model = args.model or DEFAULT_MODEL
+        use_batch_api = args.batch or BATCH_CONFIG.get("use_batch_api", False)
+        results, source_files = self.run_batch_processing(texts, model, args.bilingual, use_batch_api=use_batch_api)
+        if not results:
+            print("❌ 批处理失败")
+            return []
+        
+        return self.generate_output_files(results, source_files, model, [args.format])
+    
+    def _split_config_from_args(self, args) -> SplitConfig:
+        """根据命令行参数构建分割配置"""
+        if args.splitter == "whole":
+            return SplitConfig(TEXT_SPLITTING.get("whole_document_threshold", 300000), True, 0)
+        if args.splitter == "paragraph":
+            return SplitConfig(None, False, 0)
+        
+        chunk_size = args.chunk_size or TEXT_SPLITTING["default_chunk_size"]
+        overlap_size = TEXT_SPLITTING["default_overlap_size"] if args.overlap is None else args.overlap
+        return SplitConfig(chunk_size, True, overlap_size)
+
 
 def main():
     """主函数"""
@@ -851,15 +1133,34 @@ def main():
   python main.py --api-key YOUR_KEY       # 指定API密钥
   python main.py --file sample.txt        # 指定输入文件
   python main.py --format csv             # 指定输出格式
+  python main.py --file sample.txt --batch  # 通过Batch API提交（半价）
+  python main.py --process-all --splitter smart --output-format excel  # 无交互处理整个文件夹
         """
     )
     
     parser.add_argument("--api-key", help="OpenAI API密钥")
     parser.add_argument("--file", help="输入文件路径")
-    parser.add_argument("--format", choices=["json", "csv", "txt"], 
+    parser.add_argument("--format", "--output-format", dest="format",
+                       choices=["json", "csv", "excel", "tbx", "txt"],
                        default="json", help="输出格式")
     parser.add_argument("--model", help="使用的模型")
     parser.add_argument("--chunk-size", type=int, help="文本分块大小")
+    parser.add_argument("--batch", action="store_true",
+                       help="通过OpenAI Batch API提交（仅非交互模式，半价，最长24小时返回）")
+    parser.add_argument("--process-all", action="store_true",
+                       help="无交互处理file preparation文件夹中的所有文件")
+    parser.add_argument("--splitter", choices=["smart", "whole", "paragraph"], default="smart",
+                       help="分割方式：智能分割/整文档/按段落（无交互模式）")
+    parser.add_argument("--overlap", type=int, help="重叠大小（字符数，智能分割）")
+    parser.add_argument("--max-rpm", type=int, help="每分钟最大请求数（按模型配额设置）")
+    parser.add_argument("--max-tpm", type=int, help="每分钟最大token数（按模型配额设置）")
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument("--bilingual", dest="bilingual", action="store_true", default=True,
+                            help="双语模式（默认）")
+    mode_group.add_argument("--monolingual", dest="bilingual", action="store_false",
+                            help="单语模式")
+    parser.add_argument("--no-prompt", action="store_true",
+                       help="按命令行参数运行完整流程并直接生成输出文件，不进行任何交互")
     
     args = parser.parse_args()
     
@@ -870,8 +1171,17 @@ def main():
     if args.api_key:
         app.api_key = args.api_key
     
+    # 设置速率限制
+    if args.max_rpm:
+        app.max_rpm = args.max_rpm
+    if args.max_tpm:
+        app.max_tpm = args.max_tpm
+    
+    # 无交互模式：加载、抽取和输出全部由命令行参数决定
+    if args.no_prompt or args.process_all:
+        app.run_headless(args)
     # 非交互模式
-    if args.file:
+    elif args.file:
         _run_non_interactive_mode(app, args)
     else:
         # 交互模式
@@ -886,6 +1196,8 @@ def _run_non_interactive_mode(app: TermExtractionApp, args):
     if not app.setup_api_key():
         return
     
+    from gpt_processor import load_texts_from_file
+    
     # 加载文本
     try:
         # 使用默认配置：智能分割，如果没有指定chunk_size则按段落处理
@@ -895,7 +1207,8 @@ def _run_non_interactive_mode(app: TermExtractionApp, args):
             chunk_size=chunk_size if args.chunk_size else None,
             use_smart_splitter=True,
             overlap_size=TEXT_SPLITTING["default_overlap_size"],
-            enable_ocr=app.enable_ocr  # 使用app的OCR配置
+            enable_ocr=app.enable_ocr,  # 使用app的OCR配置
+            save_intermediate=FILE_PROCESSING.get("save_intermediate_text", False)
         )
         print(f"✅ 从文件加载了 {len(texts)} 个文本")
     except Exception as e:
@@ -907,7 +1220,8 @@ def _run_non_interactive_mode(app: TermExtractionApp, args):
     model = args.model or DEFAULT_MODEL
     
     # 运行批处理
-    results = app.run_batch_processing(texts, args.format, model)
+    use_batch_api = args.batch or BATCH_CONFIG.get("use_batch_api", False)
+    results, _ = app.run_batch_processing(texts, model, use_batch_api=use_batch_api)
     
     if results:
         print("✅ 批处理完成!")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API速率限制器
+按模型的每分钟请求数(RPM)和每分钟token数(TPM)两个维度限制请求发送速度，
+避免固定并发数在配额内跑不满或频繁触发429错误
+"""
+
+import time
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """同时限制RPM和TPM的令牌桶（线程安全）"""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            rpm: 每分钟最大请求数，None表示不限制
+            tpm: 每分钟最大token数，None表示不限制
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+
+        # 初始时桶是满的，允许一次性发出一分钟的配额
+        self._available_requests = float(rpm or 0)
+        self._available_tokens = float(tpm or 0)
+        self._last_refill = time.monotonic()
+        self._penalty_until = 0.0
+        self._penalty_factor = 1.0
+        self._lock = threading.Lock()
+
+    def _current_rpm(self, now: float) -> float:
+        """当前生效的RPM（触发429后的降速期内按比例降低）"""
+        if now < self._penalty_until:
+            return self.rpm * self._penalty_factor
+        return self.rpm
+
+    def _refill(self, now: float):
+        """按经过的时间补充令牌"""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+
+        if self.rpm:
+            rpm = self._current_rpm(now)
+            self._available_requests = min(rpm, self._available_requests + elapsed * rpm / 60)
+        if self.tpm:
+            self._available_tokens = min(self.tpm, self._available_tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int = 0):
+        """
+        阻塞直到可以发送一个请求
+
+        Args:
+            tokens: 该请求预计消耗的token数（输入+输出）
+        """
+        # 单个请求超过整桶容量时按整桶计算，否则永远无法获取
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                wait = 0.0
+                if self.rpm and self._available_requests < 1:
+                    wait = (1 - self._available_requests) * 60 / self._current_rpm(now)
+                if self.tpm and self._available_tokens < tokens:
+                    wait = max(wait, (tokens - self._available_tokens) * 60 / self.tpm)
+
+                if wait <= 0:
+                    if self.rpm:
+                        self._available_requests -= 1
+                    if self.tpm:
+                        self._available_tokens -= tokens
+                    return
+
+            # 最多等待1秒后重新检查，期间其他线程可以释放或消耗令牌
+            time.sleep(min(wait, 1.0))
+
+    def penalize(self, factor: float = 0.75, duration: float = 60):
+        """
+        触发429错误后临时降低请求速率
+
+        Args:
+            factor: 降速期内RPM的比例
+            duration: 降速持续时间（秒）
+        """
+        if not self.rpm:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._penalty_factor = factor
+            self._penalty_until = now + duration
+            self._available_requests = min(self._available_requests, self.rpm * factor)
+
+        logger.warning("触发速率限制，%d秒内RPM降至 %d", duration, int(self.rpm * factor))
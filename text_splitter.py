@@ -8,7 +8,10 @@
 
 import re
 import logging
-from typing import List, Dict, Union
+import importlib.util
+from bisect import bisect_left
+from functools import lru_cache, partial
+from typing import List, Dict, Union, Iterable, Optional, Callable, Tuple
 from dataclasses import dataclass
 
 # 配置日志
@@ -18,15 +21,80 @@ logger = logging.getLogger(__name__)
 # 依赖检查
 # =============================================================================
 
-try:
-    import tiktoken
-    TIKTOKEN_AVAILABLE = True
+# 只检查是否安装，tiktoken在首次创建TokenCounter时才导入
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+if TIKTOKEN_AVAILABLE:
     logger.info("✅ tiktoken 可用")
-except ImportError:
-    TIKTOKEN_AVAILABLE = False
+else:
     logger.warning("⚠️  tiktoken 不可用，将使用字符估算")
 
 
+# =============================================================================
+# 预编译正则
+# =============================================================================
+
+_CJK_RUN_RE = re.compile(r'[\u4e00-\u9fff]+')  # 连续的中文字符（token估算用）
+# 需要清理的空白：多个空行，以及包含制表符或长度超过1的空格/制表符序列（单个空格无需替换）
+_WHITESPACE_CLEANUP_RE = re.compile(r'\n\s*\n\s*\n+|\t[ \t]*| [ \t]+')
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')  # 段落分隔
+_SENTENCE_SPLIT_RE = re.compile(r'[。！？；.!?;]\s*')  # 中英文句末标点
+_WHITESPACE_RE = re.compile(r'\s+')  # 空白（按长度切分时的最后手段）
+
+# 按长度切分时使用的分隔符（按优先级排列），均为固定字符串，用str.rfind查找
+_FAST_DELIMITERS = ('\n\n', '。\n', '！\n', '？\n', '\n', '。', '！', '？', '；', '，')
+
+
+def _replace_whitespace(match: re.Match) -> str:
+    """多个空行变为双空行，多个空格（制表符）变为单个空格"""
+    return '\n\n' if match.group()[0] == '\n' else ' '
+
+
+def _nearest_match_end(regex: re.Pattern, text: str, start: int, end: int, target: int) -> Optional[int]:
+    """
+    在text[start:end]范围内查找结束位置最接近target的匹配
+    
+    正则直接在原文本上匹配（不复制窗口），匹配按位置先后产出且结束位置递增，
+    越过target后即可停止扫描；距离相同时取靠前的匹配
+    
+    Returns:
+        Optional[int]: 匹配的结束位置（绝对位置），没有匹配时返回None
+    """
+    prev_end = None
+    for match in regex.finditer(text, start, end):
+        match_end = match.end()
+        if match_end >= target:
+            if prev_end is not None and target - prev_end <= match_end - target:
+                return prev_end
+            return match_end
+        prev_end = match_end
+    return prev_end
+
+
+def _strip_indices(text: str, start: int, end: int) -> Tuple[int, int]:
+    """
+    计算text[start:end].strip()在text中的范围，不创建中间字符串
+    
+    切分点通常紧跟在空行或空格之后，两端需要跳过的空白只有几个字符
+    """
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _count_cjk_chars(text: str) -> int:
+    """
+    统计中文字符数
+    
+    按连续片段匹配后累加长度，不为每个字符单独创建对象；
+    纯ASCII文本不可能包含中文，用O(1)的str.isascii()直接排除
+    """
+    if text.isascii():
+        return 0
+    return sum(map(len, _CJK_RUN_RE.findall(text)))
+
+
 # =============================================================================
 # 数据结构
 # =============================================================================
@@ -39,11 +107,7 @@ class TextChunk:
     end_pos: int
     tokens: int
     chunk_id: int
-    metadata: Dict[str, Union[str, int]] = None
-    
-    def __post_init__(self):
-        if self.metadata is None:
-            self.metadata = {}
+    metadata: Optional[Dict[str, Union[str, int]]] = None  # 大多数块没有元数据，不单独创建空字典
 
 
 @dataclass
@@ -60,9 +124,49 @@ class SplitResult:
 # Token计算器
 # =============================================================================
 
+@lru_cache(maxsize=None)
+def _get_encoding(encoding_name: str):
+    """
+    获取tiktoken编码器
+    
+    按编码名称缓存，所有TokenCounter共享同一编码器；
+    初始化失败的结果同样被缓存，不会在每次创建分割器时重复尝试
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"tiktoken初始化失败: {e}")
+        return None
+
+
+def _count_tiktoken(encoding, text: str) -> int:
+    """用tiktoken计算token数量（特殊token按普通文本编码，空文本编码为空列表）"""
+    return len(encoding.encode_ordinary(text))
+
+
+def _count_fallback(text: str) -> int:
+    """字符估算token数量：中文约2字符=1token，英文约4字符=1token"""
+    chinese_chars = _count_cjk_chars(text)
+    other_chars = len(text) - chinese_chars
+    return int(chinese_chars * 0.5 + other_chars * 0.25)
+
+
+# 切分边界搜索、合并、重叠等会对同一片段重复计数，命中缓存时不再重新编码。
+# 缓存放在模块级并按编码器区分，不引用TokenCounter实例，实例释放时不会被缓存拖住；
+# 缓存会保留文本本身，整篇文本、流式缓冲区等一次性计数不经过缓存
+_COUNT_CACHE_SIZE = 1024
+_count_tiktoken_cached = lru_cache(maxsize=_COUNT_CACHE_SIZE)(_count_tiktoken)
+_count_fallback_cached = lru_cache(maxsize=_COUNT_CACHE_SIZE)(_count_fallback)
+
+
 class TokenCounter:
     """Token计算器"""
     
+    # 计数函数，由set_encoding按编码器绑定；绑定前使用字符估算
+    _count = staticmethod(_count_fallback_cached)
+    _count_uncached = staticmethod(_count_fallback)
+    
     def __init__(self, encoding_name: str = "cl100k_base"):
         """
         初始化Token计算器
@@ -76,20 +180,33 @@ class TokenCounter:
     
     def _init_encoding(self):
         """初始化编码器"""
-        if TIKTOKEN_AVAILABLE:
-            try:
-                self.encoding = tiktoken.get_encoding(self.encoding_name)
-                logger.debug(f"使用tiktoken编码器: {self.encoding_name}")
-            except Exception as e:
-                logger.warning(f"tiktoken初始化失败: {e}")
-                self.encoding = None
-        
-        if not self.encoding:
+        encoding = _get_encoding(self.encoding_name) if TIKTOKEN_AVAILABLE else None
+        if encoding:
+            logger.debug(f"使用tiktoken编码器: {self.encoding_name}")
+        else:
             logger.info("使用字符估算模式 (1 token ≈ 4 字符)")
+        self.set_encoding(encoding)
+    
+    def set_encoding(self, encoding):
+        """
+        设置编码器并绑定对应的计数方法
+        
+        计数方法在这里一次选定，count_tokens调用时不再判断编码器是否可用
+        
+        Args:
+            encoding: tiktoken编码器，None表示使用字符估算
+        """
+        self.encoding = encoding
+        if encoding:
+            self._count = partial(_count_tiktoken_cached, encoding)
+            self._count_uncached = partial(_count_tiktoken, encoding)
+        else:
+            self._count = _count_fallback_cached
+            self._count_uncached = _count_fallback
     
     def count_tokens(self, text: str) -> int:
         """
-        计算文本的token数量
+        计算文本的token数量（带缓存）
         
         Args:
             text: 输入文本
@@ -97,19 +214,41 @@ class TokenCounter:
         Returns:
             int: token数量
         """
-        if not text:
-            return 0
+        return self._count(text)
+    
+    def count_tokens_uncached(self, text: str) -> int:
+        """
+        计算文本的token数量（不经过缓存，用于只计数一次的长文本）
+        
+        Args:
+            text: 输入文本
+            
+        Returns:
+            int: token数量
+        """
+        return self._count_uncached(text)
+    
+    def token_offsets(self, text: str) -> Optional[List[int]]:
+        """
+        编码文本并返回每个token的起始字符位置（升序）
         
-        if self.encoding:
-            try:
-                return len(self.encoding.encode(text))
-            except Exception:
-                pass
+        前缀text[:end]的token数即起始位置小于end的token数，
+        一次编码即可用二分查找回答任意前缀的token数
         
-        # 回退到字符估算：中文约2字符=1token，英文约4字符=1token
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        other_chars = len(text) - chinese_chars
-        return int(chinese_chars * 0.5 + other_chars * 0.25)
+        Args:
+            text: 输入文本
+            
+        Returns:
+            Optional[List[int]]: token起始位置列表，tiktoken不可用或编码失败时返回None
+        """
+        if not self.encoding or not text:
+            return None
+        
+        try:
+            _, offsets = self.encoding.decode_with_offsets(self.encoding.encode_ordinary(text))
+        except Exception:
+            return None
+        return offsets
     
     def estimate_tokens(self, char_count: int) -> int:
         """
@@ -121,7 +260,7 @@ class TokenCounter:
         Returns:
             int: 估算的token数
         """
-        return max(1, int(char_count * 0.3))  # 保守估算
+        return max(1, char_count * 3 // 10)  # 保守估算（约0.3 token/字符，整数运算）
 
 
 # =============================================================================
@@ -134,7 +273,8 @@ class TextSplitter:
     def __init__(self, 
                  max_tokens: int = 3000,
                  overlap_tokens: int = 200,
-                 encoding_name: str = "cl100k_base"):
+                 encoding_name: str = "cl100k_base",
+                 prefix_overlap_only: bool = True):
         """
         初始化文本分割器
         
@@ -142,19 +282,28 @@ class TextSplitter:
             max_tokens: 每个片段的最大token数
             overlap_tokens: 片段间重叠的token数
             encoding_name: token编码方式
+            prefix_overlap_only: 是否只在片段开头添加前一片段的结尾作为重叠；
+                为False时还会在结尾追加下一片段的开头，每个边界的重叠内容会被发送两次
         """
         self.max_tokens = max_tokens
         self.overlap_tokens = overlap_tokens
+        self.prefix_overlap_only = prefix_overlap_only
         self.token_counter = TokenCounter(encoding_name)
         
+        # 切分时使用的字符数上限（搜索窗口）和目标字符数，按1 token约3~4字符换算
+        self._window_chars = int(max_tokens * 4)
+        self._target_chars = int(max_tokens * 3)
+        
         # 分割策略配置
         self.split_patterns = self._init_split_patterns()
+        # 按优先级排列的预编译正则，切分循环中直接遍历，不再逐个查字典
+        self._split_regexes = tuple(pattern_info["regex"] for pattern_info in self.split_patterns)
         
         logger.info(f"文本分割器初始化: max_tokens={max_tokens}, overlap={overlap_tokens}")
     
-    def _init_split_patterns(self) -> List[Dict[str, Union[str, int]]]:
-        """初始化分割模式"""
-        return [
+    def _init_split_patterns(self) -> List[Dict[str, Union[str, int, re.Pattern]]]:
+        """初始化分割模式（regex为预编译的正则，切分时直接使用）"""
+        patterns = [
             {"pattern": r'\n\s*\n\s*\n+', "priority": 1, "name": "多空行"},
             {"pattern": r'\n\s*\n', "priority": 2, "name": "双换行"},
             {"pattern": r'[。！？；]\s*\n', "priority": 3, "name": "句末换行"},
@@ -164,6 +313,11 @@ class TextSplitter:
             {"pattern": r'[，、]\s+', "priority": 7, "name": "逗号空格"},
             {"pattern": r'\s+', "priority": 8, "name": "空格"},
         ]
+        # 使用标准库re编译：这些模式都是简单的字符类和量词，不存在回溯问题，
+        # 第三方regex库（包括原子分组写法）在这些模式上反而更慢
+        for pattern_info in patterns:
+            pattern_info["regex"] = re.compile(pattern_info["pattern"])
+        return patterns
     
     # =============================================================================
     # 主要分割方法
@@ -205,7 +359,7 @@ class TextSplitter:
         processed_text = self._preprocess_text(text)
         
         # 检查是否需要分割
-        total_tokens = self.token_counter.count_tokens(processed_text)
+        total_tokens = self.token_counter.count_tokens_uncached(processed_text)
         if total_tokens <= self.max_tokens:
             return self._create_single_chunk_result(processed_text, total_tokens)
         
@@ -229,20 +383,145 @@ class TextSplitter:
             List[str]: 带标签的文本片段
         """
         result = self.split_text_advanced(text)
+        return self._label_chunks(result, source_file)
+    
+    def split_stream(self, pages: Iterable[str], source_file: str = "") -> List[str]:
+        """
+        流式分割多页文本并添加元数据标签
         
-        labeled_chunks = []
-        for i, chunk in enumerate(result.chunks, 1):
-            if result.total_chunks > 1:
-                # 计算token数用于显示
-                token_count = self.token_counter.count_tokens(chunk.content)
-                label = f"[文件: {source_file} - 片段 {i}/{result.total_chunks} ({token_count} tokens)]"
-                labeled_content = f"{label}\n{chunk.content}"
-            else:
-                labeled_content = f"[文件: {source_file}]\n{chunk.content}"
+        结果与 split_text_with_metadata('\n\n'.join(pages), source_file) 一致，
+        但不拼接完整文档，只保留当前页和尚未切出的滚动缓冲区
+        
+        Args:
+            pages: 逐页（或逐段）产出文本的可迭代对象
+            source_file: 来源文件名
+            
+        Returns:
+            List[str]: 带标签的文本片段
+        """
+        result = self.split_stream_advanced(pages)
+        return self._label_chunks(result, source_file)
+    
+    def split_stream_advanced(self, pages: Iterable[str]) -> SplitResult:
+        """
+        流式分割多页文本，返回详细结果
+        
+        Args:
+            pages: 逐页（或逐段）产出文本的可迭代对象
             
-            labeled_chunks.append(labeled_content)
+        Returns:
+            SplitResult: 分割结果
+        """
+        chunks = []
+        buffer = ""  # 已预处理、尚未切出的文本
+        offset = 0  # 缓冲区在完整预处理文本中的起始位置
+        pending_whitespace = ""  # 末尾空白可能与下一页开头的空白合并，暂不处理
+        original_length = 0
+        splitting = False  # 总token数超过上限后才开始切分，否则保持单块
+        buffered_tokens = 0  # 开始切分前缓冲区的token数（逐段累加）
+        exact_length = 0  # buffered_tokens为精确计数时对应的缓冲区长度
+        count_tokens = self.token_counter.count_tokens_uncached
+        
+        for page_index, page in enumerate(pages):
+            if page_index > 0:
+                pending_whitespace += "\n\n"
+                original_length += 2
+            original_length += len(page)
+            
+            raw = pending_whitespace + page
+            stable_length = len(raw.rstrip())
+            pending_whitespace = raw[stable_length:]
+            if not stable_length:
+                continue
+            
+            # 空白段不会跨越stable部分的边界，因此逐段预处理与整体预处理结果相同
+            segment = self._normalize_whitespace(raw[:stable_length])
+            if not buffer and offset == 0:
+                segment = segment.lstrip()
+            if not splitting:
+                # 只对新加入的段落计数；段落衔接处的合并可能使累加值与整体计数相差几个token，
+                # 累加值越过上限时再对整个缓冲区精确计数确认
+                buffered_tokens += count_tokens(segment)
+                if not buffer:
+                    exact_length = len(segment)
+                if buffered_tokens > self.max_tokens:
+                    buffered_tokens = count_tokens(buffer + segment)
+                    exact_length = len(buffer) + len(segment)
+                    splitting = buffered_tokens > self.max_tokens
+            buffer += segment
+            
+            if splitting:
+                buffer, offset = self._cut_stream_chunks(buffer, offset, chunks, final=False)
+        
+        if not splitting:
+            if not buffer:
+                return SplitResult(
+                    chunks=[],
+                    total_chunks=0,
+                    total_tokens=0,
+                    original_length=0,
+                    overlap_info={}
+                )
+            # 累加值只是估算时精确计数一次，低估导致的未切分在这里补上
+            total_tokens = buffered_tokens if exact_length == len(buffer) else count_tokens(buffer)
+            if total_tokens <= self.max_tokens:
+                return self._create_single_chunk_result(buffer, total_tokens)
+        
+        self._cut_stream_chunks(buffer, offset, chunks, final=True)
         
-        return labeled_chunks
+        # 后处理：合并小块、添加重叠
+        chunks = self._post_process_chunks(chunks)
+        
+        return self._create_split_result(chunks, original_length)
+    
+    def _cut_stream_chunks(self, buffer: str, offset: int, chunks: List[TextChunk], final: bool):
+        """
+        从流式缓冲区切出文本块
+        
+        非最终阶段只在缓冲区剩余超过一个搜索窗口时切分，
+        此时_find_chunk_end的结果与在完整文本上相同
+        
+        Returns:
+            tuple: (剩余缓冲区, 剩余缓冲区的起始位置)
+        """
+        current_pos = 0
+        buffer_length = len(buffer)
+        # 最终阶段切到缓冲区末尾，否则保留至少一个搜索窗口
+        stop_pos = buffer_length if final else buffer_length - self._window_chars
+        find_chunk_end = self._find_chunk_end
+        count_tokens = self.token_counter.count_tokens_uncached
+        
+        while current_pos < stop_pos:
+            end_pos = find_chunk_end(buffer, current_pos)
+            
+            content_start, content_end = _strip_indices(buffer, current_pos, end_pos)
+            if content_start < content_end:
+                chunk_content = buffer[content_start:content_end]
+                chunks.append(TextChunk(
+                    content=chunk_content,
+                    start_pos=offset + content_start,
+                    end_pos=offset + content_end,
+                    tokens=count_tokens(chunk_content),
+                    chunk_id=len(chunks)
+                ))
+            
+            current_pos = end_pos
+        
+        return buffer[current_pos:], offset + current_pos
+    
+    def _label_chunks(self, result: SplitResult, source_file: str) -> List[str]:
+        """为分割结果添加文件和片段标签"""
+        total_chunks = result.total_chunks
+        label_prefix = f"[文件: {source_file}"
+        
+        if total_chunks <= 1:
+            return [f"{label_prefix}]\n{chunk.content}" for chunk in result.chunks]
+        
+        # 标签中的token数直接使用分割时已计算的值
+        return [
+            f"{label_prefix} - 片段 {i}/{total_chunks} ({chunk.tokens} tokens)]\n{chunk.content}"
+            for i, chunk in enumerate(result.chunks, 1)
+        ]
     
     # =============================================================================
     # 特定分割策略
@@ -262,7 +541,7 @@ class TextSplitter:
             return []
         
         # 按双换行分割段落
-        paragraphs = re.split(r'\n\s*\n', text.strip())
+        paragraphs = _PARAGRAPH_SPLIT_RE.split(text.strip())
         
         # 过滤空段落并清理
         clean_paragraphs = []
@@ -291,9 +570,8 @@ class TextSplitter:
         if not text:
             return []
         
-        # 中英文句子分割模式
-        sentence_pattern = r'[。！？；.!?;]\s*'
-        sentences = re.split(sentence_pattern, text)
+        # 按中英文句末标点分割
+        sentences = _SENTENCE_SPLIT_RE.split(text)
         
         # 清理并过滤空句子
         clean_sentences = []
@@ -326,11 +604,13 @@ class TextSplitter:
         
         chunks = []
         start = 0
+        text_length = len(text)
+        overlap_length = int(max_length * 0.1)  # 10%重叠
         
-        while start < len(text):
+        while start < text_length:
             end = start + max_length
             
-            if end >= len(text):
+            if end >= text_length:
                 # 最后一块
                 chunks.append(text[start:])
                 break
@@ -339,9 +619,8 @@ class TextSplitter:
             cut_pos = self._find_best_cut_position(text, start, end)
             chunks.append(text[start:cut_pos])
             
-            # 计算下一个起始位置（考虑重叠）
-            overlap_length = int(max_length * 0.1)  # 10%重叠
-            start = max(cut_pos - overlap_length, cut_pos)
+            # 下一块从切分点之前的重叠位置开始，且至少前进一个字符
+            start = max(cut_pos - overlap_length, start + 1)
         
         return chunks
     
@@ -351,42 +630,51 @@ class TextSplitter:
     
     def _preprocess_text(self, text: str) -> str:
         """预处理文本"""
-        # 统一换行符
-        text = re.sub(r'\r\n|\r', '\n', text)
-        
-        # 清理多余的空白字符
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)  # 多个空行变为双空行
-        text = re.sub(r'[ \t]+', ' ', text)  # 多个空格变为单个空格
+        text = self._normalize_whitespace(text)
         
         # 清理首尾空白
         text = text.strip()
         
         return text
     
+    def _normalize_whitespace(self, text: str) -> str:
+        """统一换行符并清理多余的空白字符（不处理首尾空白）"""
+        # 统一换行符（不含\r时跳过）
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        
+        # 清理多余的空白字符：空行和空格在同一次扫描中处理
+        return _WHITESPACE_CLEANUP_RE.sub(_replace_whitespace, text)
+    
     def _split_by_patterns(self, text: str) -> List[TextChunk]:
         """使用模式分割文本"""
         chunks = []
         current_pos = 0
         chunk_id = 0
         
-        while current_pos < len(text):
+        # 循环中反复使用的方法绑定到局部变量，避免每次迭代查找属性
+        text_length = len(text)
+        find_chunk_end = self._find_chunk_end
+        count_tokens = self.token_counter.count_tokens_uncached
+        append_chunk = chunks.append
+        
+        while current_pos < text_length:
             # 计算当前块的结束位置
-            end_pos = self._find_chunk_end(text, current_pos)
+            end_pos = find_chunk_end(text, current_pos)
             
-            if end_pos > current_pos:
-                chunk_content = text[current_pos:end_pos].strip()
-                if chunk_content:
-                    token_count = self.token_counter.count_tokens(chunk_content)
-                    
-                    chunk = TextChunk(
-                        content=chunk_content,
-                        start_pos=current_pos,
-                        end_pos=end_pos,
-                        tokens=token_count,
-                        chunk_id=chunk_id
-                    )
-                    chunks.append(chunk)
-                    chunk_id += 1
+            # 去掉两端空白后只切片一次
+            content_start, content_end = _strip_indices(text, current_pos, end_pos)
+            if content_start < content_end:
+                chunk_content = text[content_start:content_end]
+                
+                append_chunk(TextChunk(
+                    content=chunk_content,
+                    start_pos=content_start,
+                    end_pos=content_end,
+                    tokens=count_tokens(chunk_content),
+                    chunk_id=chunk_id
+                ))
+                chunk_id += 1
             
             current_pos = end_pos
         
@@ -394,34 +682,49 @@ class TextSplitter:
     
     def _find_chunk_end(self, text: str, start_pos: int) -> int:
         """找到块的最佳结束位置"""
-        max_end = min(start_pos + int(self.max_tokens * 4), len(text))
+        max_end = min(start_pos + self._window_chars, len(text))
         
         # 如果剩余文本很短，直接返回结尾
         if max_end >= len(text):
             return len(text)
         
         # 在最大范围内寻找最佳切分点
-        best_pos = max_end
-        
-        for pattern_info in self.split_patterns:
-            pattern = pattern_info["pattern"]
-            matches = list(re.finditer(pattern, text[start_pos:max_end]))
+        max_tokens = self.max_tokens
+        target_pos = start_pos + self._target_chars  # 目标字符位置
+        count_prefix = None  # 搜索窗口的前缀token计数函数，首次验证候选位置时创建
+        prefix_exact = True  # 前缀计数是否精确
+        
+        for regex in self._split_regexes:
+            # 选择结束位置最接近目标长度的匹配
+            candidate_pos = _nearest_match_end(regex, text, start_pos, max_end, target_pos)
             
-            if matches:
-                # 选择最接近目标长度的匹配
-                target_pos = int(self.max_tokens * 3)  # 目标字符位置
-                best_match = min(matches, 
-                               key=lambda m: abs(m.end() - target_pos))
-                
-                candidate_pos = start_pos + best_match.end()
-                
+            if candidate_pos is not None:
                 # 验证token数量
-                chunk_text = text[start_pos:candidate_pos]
-                if self.token_counter.count_tokens(chunk_text) <= self.max_tokens:
-                    best_pos = candidate_pos
-                    break
+                if count_prefix is None:
+                    count_prefix, prefix_exact = self._prefix_token_counter(text[start_pos:max_end])
+                if count_prefix(candidate_pos - start_pos) > max_tokens:
+                    continue
+                # 前缀计数可能少算边界处的token，接受前精确计数确认一次
+                if prefix_exact or self.token_counter.count_tokens_uncached(text[start_pos:candidate_pos]) <= max_tokens:
+                    return candidate_pos
+        
+        return max_end
+    
+    def _prefix_token_counter(self, window: str) -> Tuple[Callable[[int], int], bool]:
+        """
+        创建计算window[:end]token数的函数
+        
+        tiktoken可用时整个搜索窗口只编码一次，各候选位置的前缀token数通过二分查找得到
+        （跨越候选位置的token计入前缀，与单独编码前缀相比可能相差边界处的一两个token）；
+        否则对每个前缀单独计数
         
-        return best_pos
+        Returns:
+            Tuple: (计数函数, 计数是否精确)
+        """
+        offsets = self.token_counter.token_offsets(window)
+        if offsets is None:
+            return (lambda end: self.token_counter.count_tokens_uncached(window[:end])), True
+        return (lambda end: bisect_left(offsets, end)), False
     
     def _find_best_cut_position(self, text: str, start: int, max_end: int) -> int:
         """找到最佳切分位置"""
@@ -430,16 +733,24 @@ class TextSplitter:
         
         # 在最后20%的范围内寻找合适的切分点
         search_start = max_end - int((max_end - start) * 0.2)
-        search_text = text[search_start:max_end]
         
-        for pattern_info in self.split_patterns[:4]:  # 只使用前4个高优先级模式
-            pattern = pattern_info["pattern"]
-            matches = list(re.finditer(pattern, search_text))
-            
-            if matches:
-                # 选择最后一个匹配
-                last_match = matches[-1]
-                return search_start + last_match.end()
+        # 按优先级查找最后一个分隔符，在分隔符之后切分
+        for delimiter in _FAST_DELIMITERS:
+            index = text.rfind(delimiter, search_start, max_end)
+            if index != -1:
+                return index + len(delimiter)
+        
+        # 没有分隔符时在最后一个空格之后切分
+        space_pos = max(text.rfind(' ', search_start, max_end), text.rfind('\t', search_start, max_end))
+        if space_pos != -1:
+            return space_pos + 1
+        
+        # 其他空白字符（较少见）使用正则查找
+        last_match = None
+        for last_match in _WHITESPACE_RE.finditer(text, search_start, max_end):
+            pass
+        if last_match:
+            return last_match.end()
         
         # 如果找不到合适的切分点，就在最大位置切分
         return max_end
@@ -477,7 +788,7 @@ class TextSplitter:
                 
                 next_chunk = chunks[i + 1]
                 merged_content = current_chunk.content + "\n\n" + next_chunk.content
-                merged_tokens = self.token_counter.count_tokens(merged_content)
+                merged_tokens = self.token_counter.count_tokens_uncached(merged_content)
                 
                 merged_chunk = TextChunk(
                     content=merged_content,
@@ -502,26 +813,39 @@ class TextSplitter:
             return chunks
         
         overlapped_chunks = []
+        separator = "\n...\n"
+        separator_tokens = self.token_counter.count_tokens(separator)
+        
+        # 双侧重叠时中间的块会被前后两个块各截取一次，预先编码使每个块只编码一次
+        if self.prefix_overlap_only:
+            token_ids = [None] * len(chunks)
+        else:
+            token_ids = [self._encode(chunk.content) for chunk in chunks]
         
         for i, chunk in enumerate(chunks):
             content = chunk.content
+            # token数由各部分累加得到，不对拼接后的内容重新编码
+            new_tokens = chunk.tokens
             
             # 添加前一个块的结尾作为重叠
             if i > 0:
                 prev_chunk = chunks[i - 1]
-                overlap_text = self._extract_overlap_text(prev_chunk.content, True)
+                overlap_text, overlap_tokens = self._extract_overlap_text(
+                    prev_chunk.content, True, token_ids[i - 1]
+                )
                 if overlap_text:
-                    content = overlap_text + "\n...\n" + content
+                    content = overlap_text + separator + content
+                    new_tokens += overlap_tokens + separator_tokens
             
-            # 添加下一个块的开头作为重叠
-            if i < len(chunks) - 1:
+            # 添加下一个块的开头作为重叠（单侧重叠时边界上下文已由下一块的开头提供）
+            if not self.prefix_overlap_only and i < len(chunks) - 1:
                 next_chunk = chunks[i + 1]
-                overlap_text = self._extract_overlap_text(next_chunk.content, False)
+                overlap_text, overlap_tokens = self._extract_overlap_text(
+                    next_chunk.content, False, token_ids[i + 1]
+                )
                 if overlap_text:
-                    content = content + "\n...\n" + overlap_text
-            
-            # 重新计算token数
-            new_tokens = self.token_counter.count_tokens(content)
+                    content = content + separator + overlap_text
+                    new_tokens += overlap_tokens + separator_tokens
             
             overlapped_chunk = TextChunk(
                 content=content,
@@ -536,38 +860,87 @@ class TextSplitter:
         
         return overlapped_chunks
     
-    def _extract_overlap_text(self, text: str, from_end: bool) -> str:
-        """提取重叠文本"""
+    def _extract_overlap_text(self, text: str, from_end: bool,
+                              token_ids: Optional[List[int]] = None) -> Tuple[str, int]:
+        """
+        提取重叠文本
+        
+        tiktoken可用时只编码一次，截取结尾（或开头）的目标数量token后解码；
+        否则直接按字符截取，不拆分单词
+        
+        Args:
+            text: 被截取的文本
+            from_end: 是否从结尾截取
+            token_ids: 文本已有的编码结果，None时在此编码
+        
+        Returns:
+            Tuple[str, int]: (重叠文本, 重叠文本的token数)
+        """
         target_tokens = min(self.overlap_tokens, self.max_tokens // 4)
+        if target_tokens <= 0:
+            return "", 0
+        
+        if token_ids is None:
+            token_ids = self._encode(text)
+        if token_ids is not None:
+            token_ids = token_ids[-target_tokens:] if from_end else token_ids[:target_tokens]
+            # 截取边界可能落在多字节字符内部，从截取边界一侧逐个去掉token，
+            # 直到剩余token恰好解码为完整字符，使返回的token数与文本一致
+            decode_bytes = self.token_counter.encoding.decode_bytes
+            while token_ids:
+                try:
+                    return decode_bytes(token_ids).decode('utf-8'), len(token_ids)
+                except UnicodeDecodeError:
+                    token_ids = token_ids[1:] if from_end else token_ids[:-1]
+            return "", 0
+        
+        # 先按约3字符/token截取，估算的token数超出目标时按比例缩短
+        approx_chars = target_tokens * 3
+        overlap_text = self._slice_overlap(text, approx_chars, from_end)
+        tokens = self.token_counter.count_tokens(overlap_text)
+        if tokens > target_tokens:
+            approx_chars = len(overlap_text) * target_tokens // tokens
+            overlap_text = self._slice_overlap(text, approx_chars, from_end)
+        
+        overlap_text = overlap_text.strip()
+        return overlap_text, self.token_counter.count_tokens(overlap_text)
+    
+    @staticmethod
+    def _slice_overlap(text: str, char_count: int, from_end: bool) -> str:
+        """
+        截取文本结尾（或开头）的char_count个字符
+        
+        截取边界落在单词中间时去掉不完整的单词（没有空白的文本，如中文，保持原样）
+        """
+        if char_count <= 0:
+            return ""
+        if char_count >= len(text):
+            return text
         
         if from_end:
-            # 从文本结尾提取
-            words = text.split()
-            overlap_words = []
-            current_tokens = 0
-            
-            for word in reversed(words):
-                word_tokens = self.token_counter.count_tokens(word)
-                if current_tokens + word_tokens > target_tokens:
-                    break
-                overlap_words.insert(0, word)
-                current_tokens += word_tokens
-            
-            return ' '.join(overlap_words)
+            overlap_text = text[-char_count:]
+            if not text[-char_count - 1].isspace() and not overlap_text[0].isspace():
+                parts = overlap_text.split(None, 1)
+                if len(parts) == 2:
+                    overlap_text = parts[1]
         else:
-            # 从文本开头提取
-            words = text.split()
-            overlap_words = []
-            current_tokens = 0
-            
-            for word in words:
-                word_tokens = self.token_counter.count_tokens(word)
-                if current_tokens + word_tokens > target_tokens:
-                    break
-                overlap_words.append(word)
-                current_tokens += word_tokens
-            
-            return ' '.join(overlap_words)
+            overlap_text = text[:char_count]
+            if not text[char_count].isspace() and not overlap_text[-1].isspace():
+                parts = overlap_text.rsplit(None, 1)
+                if len(parts) == 2:
+                    overlap_text = parts[0]
+        
+        return overlap_text
+    
+    def _encode(self, text: str) -> Optional[List[int]]:
+        """用tiktoken编码文本，tiktoken不可用或编码失败时返回None"""
+        encoding = self.token_counter.encoding
+        if not encoding:
+            return None
+        try:
+            return encoding.encode_ordinary(text)
+        except Exception:
+            return None
     
     def _create_single_chunk_result(self, text: str, tokens: int) -> SplitResult:
         """创建单块结果"""
@@ -589,12 +962,18 @@ class TextSplitter:
     
     def _create_split_result(self, chunks: List[TextChunk], original_length: int) -> SplitResult:
         """创建分割结果"""
-        total_tokens = sum(chunk.tokens for chunk in chunks)
+        # 一次遍历同时统计token总数和带重叠内容的块数
+        total_tokens = 0
+        chunks_with_overlap = 0
+        for chunk in chunks:
+            total_tokens += chunk.tokens
+            if chunk.metadata and chunk.metadata.get("has_overlap"):
+                chunks_with_overlap += 1
         
         overlap_info = {
             "enabled": self.overlap_tokens > 0,
             "target_tokens": self.overlap_tokens,
-            "chunks_with_overlap": len([c for c in chunks if c.metadata and c.metadata.get("has_overlap")])
+            "chunks_with_overlap": chunks_with_overlap
         }
         
         return SplitResult(